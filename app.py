@@ -11,19 +11,35 @@
 
 
 import os
-from typing import Optional, List, Literal
+import json
+from contextlib import asynccontextmanager
+from itertools import chain
+from typing import Optional, List, Literal, Iterator, Dict
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from loguru import logger
 
-from src.evaluate import evaluate_dataset_mse_mae
+from src.evaluate import evaluate_dataset_mse_mae, shutdown_shard_pool
 from src.forecast import forecast_with_quantiles
+from src.sweep import sweep_dataset_mse_mae, load_sweep_default, save_sweep_default
+from src.panel import forecast_panel, evaluate_panel
+from src.precompute import precompute_store, make_forecast_config, file_signature
+from src.profiling import profile_task, profile_path, PROFILE_FILES
 from settings.config import settings
 
 
-app = FastAPI(title="Moirai API Server", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动预计算后台线程（MOIRAI_PRECOMPUTE_POLL_SECONDS=0 时不启动）；退出时关闭分片进程池
+    precompute_store.start()
+    yield
+    precompute_store.stop()
+    shutdown_shard_pool()
+
+
+app = FastAPI(title="Moirai API Server", version="0.1.0", lifespan=lifespan)
 
 
 class EvaluateRequest(BaseModel):
@@ -31,11 +47,15 @@ class EvaluateRequest(BaseModel):
     datasetPath: str = Field(..., description="CSV 文件路径")
     targetColumn: str = Field(..., description="目标列名")
     feature: Literal["S", "MS", "M"] = Field("S", description="特征类型：S（单变量）、MS（多变量协变量-单目标）、M（多目标）")
-    contextLength: int = Field(1680, description="上下文长度")
-    predictionLength: int = Field(64, description="预测步数（moirai-2.0-R-small最大建议64）")
+    contextLength: Optional[int] = Field(None, description="上下文长度（缺省时使用 /sweep 保存的推荐值，否则 1680）")
+    predictionLength: Optional[int] = Field(None, description="预测步数（moirai-2.0-R-small最大建议64；缺省时使用 /sweep 保存的推荐值，否则 64）")
     batchSize: int = Field(8, description="预测批大小")
+    stride: Optional[int] = Field(None, description="滑动窗口步长（缺省时使用 /sweep 保存的推荐值，否则等于预测步数）")
+    shards: int = Field(1, ge=1, le=settings.evaluate_max_shards, description="并行分片数（上限见 MOIRAI_EVALUATE_MAX_SHARDS）：>1 时将滑动窗口切分后在常驻进程池中并发预测")
     freq: str = Field("H", description="时间频率，例如 H, 15min, D")
+    aggregation: Optional[Literal["mean", "sum", "last", "max"]] = Field(None, description="重采样聚合方式；指定时先将源数据按 freq 聚合后再推理")
     trainRatio: float = Field(0.8, description="训练比例（仅用于元数据标注）")
+    profile: bool = Field(False, description="是否剖析本次请求（CPU、torch 算子与内存峰值），结果通过 /download-profile 下载")
 
 
 
@@ -46,6 +66,7 @@ class EvaluateResponse(BaseModel):
     points: int | None = Field(default=None, description="参与评估的总点数（可选）")
     usedPredictionLength: int
     usedContextLength: int
+    usedStride: int | None = Field(default=None, description="实际使用的滑动窗口步长（可选）")
     targetDim: int
     meta: dict
 
@@ -55,25 +76,188 @@ class ForecastRequest(BaseModel):
     datasetPath: str = Field(..., description="CSV 文件路径")
     targetColumn: str = Field(..., description="目标列名")
     feature: Literal["S", "MS", "M"] = Field("S", description="特征类型：S（单变量）、MS（多变量协变量-单目标）、M（多目标）")
-    contextLength: int = Field(1680, description="上下文长度")
-    predictionLength: int = Field(64, description="预测步数（moirai-2.0-R-small最大建议64）")
+    contextLength: Optional[int] = Field(None, description="上下文长度（缺省时使用 /sweep 保存的推荐值，否则 1680）")
+    predictionLength: Optional[int] = Field(None, description="预测步数（moirai-2.0-R-small最大建议64；缺省时使用 /sweep 保存的推荐值，否则 64）")
     batchSize: int = Field(8, description="预测批大小")
     lowerQuantile: float = Field(0.1, description="下分位（例如 0.1）")
     upperQuantile: float = Field(0.9, description="上分位（例如 0.9）")
     freq: str = Field("H", description="时间频率，例如 H, 15min, D")
+    aggregation: Optional[Literal["mean", "sum", "last", "max"]] = Field(None, description="重采样聚合方式；指定时先将源数据按 freq 聚合后再推理")
     trainRatio: float = Field(0.8, description="训练比例（仅用于元数据标注）")
+    profile: bool = Field(False, description="是否剖析本次请求（CPU、torch 算子与内存峰值），结果通过 /download-profile 下载")
 
 
 class ForecastResponse(BaseModel):
     median: List[float]
     lower: List[float]
     upper: List[float]
+    timestamps: Optional[List[str]] = Field(default=None, description="预测区间各点的时间戳（按 freq 推算；无日期列时为空）")
     usedPredictionLength: int
     usedContextLength: int
     targetDim: int
     meta: dict
 
 
+class PrecomputeRegisterResponse(BaseModel):
+    key: str
+    config: dict
+
+
+class SweepRequest(BaseModel):
+    taskCode: str = Field(..., description="任务代码（用于日志文件命名）")
+    datasetPath: str = Field(..., description="CSV 文件路径")
+    targetColumn: str = Field(..., description="目标列名")
+    feature: Literal["S", "MS", "M"] = Field("S", description="特征类型：S（单变量）、MS（多变量协变量-单目标）、M（多目标）")
+    contextLengths: List[int] = Field(..., min_length=1, description="候选上下文长度列表")
+    predictionLengths: List[int] = Field([64], min_length=1, description="候选预测步数列表")
+    strides: Optional[List[int]] = Field(None, description="候选滑动窗口步长列表（缺省时等于各预测步数）")
+    batchSize: int = Field(8, description="预测批大小")
+    freq: str = Field("H", description="时间频率，例如 H, 15min, D")
+    aggregation: Optional[Literal["mean", "sum", "last", "max"]] = Field(None, description="重采样聚合方式；指定时先将源数据按 freq 聚合后再推理")
+    trainRatio: float = Field(0.8, description="训练比例（仅用于元数据标注）")
+    rankBy: Literal["mse", "mae"] = Field("mse", description="排序指标")
+    saveAsDefault: bool = Field(False, description="是否将推荐配置保存为该数据集的默认值")
+
+
+class SweepResult(BaseModel):
+    rank: int
+    contextLength: int
+    predictionLength: int
+    stride: int
+    mse: float
+    mae: float
+    windows: int
+    points: int
+
+
+class SweepResponse(BaseModel):
+    results: List[SweepResult]
+    recommended: SweepResult
+    savedAsDefault: bool
+    meta: dict
+
+
+class PanelEvaluateRequest(BaseModel):
+    taskCode: str = Field(..., description="任务代码（用于日志文件命名）")
+    datasetPath: str = Field(..., description="长表 CSV 文件路径（列：条目列、date、值列）")
+    itemColumn: str = Field("item_id", description="条目分组列名")
+    targetColumn: str = Field("value", description="值列名")
+    items: Optional[List[str]] = Field(None, description="仅处理的条目列表（缺省时处理全部条目）")
+    contextLength: int = Field(1680, description="上下文长度")
+    predictionLength: int = Field(64, description="预测步数（moirai-2.0-R-small最大建议64）")
+    batchSize: int = Field(8, description="预测批大小")
+    stride: Optional[int] = Field(None, description="滑动窗口步长（缺省时等于预测步数）")
+    freq: str = Field("H", description="时间频率，例如 H, 15min, D")
+    aggregation: Optional[Literal["mean", "sum", "last", "max"]] = Field(None, description="重采样聚合方式；指定时先将源数据按 freq 聚合后再推理")
+    stream: bool = Field(False, description="是否以 NDJSON 逐条目流式返回")
+
+
+class PanelEvaluateItem(BaseModel):
+    itemId: str
+    mse: float | None = None
+    mae: float | None = None
+    windows: int | None = None
+    points: int | None = None
+    usedPredictionLength: int | None = None
+    usedContextLength: int | None = None
+    usedStride: int | None = None
+    error: str | None = Field(default=None, description="该条目无法评估时的原因")
+
+
+class PanelEvaluateResponse(BaseModel):
+    mse: float | None = Field(default=None, description="全部条目按点数加权的 MSE")
+    mae: float | None = Field(default=None, description="全部条目按点数加权的 MAE")
+    items: List[PanelEvaluateItem]
+    meta: dict
+
+
+class PanelForecastRequest(BaseModel):
+    taskCode: str = Field(..., description="任务代码（用于日志文件命名）")
+    datasetPath: str = Field(..., description="长表 CSV 文件路径（列：条目列、date、值列）")
+    itemColumn: str = Field("item_id", description="条目分组列名")
+    targetColumn: str = Field("value", description="值列名")
+    items: Optional[List[str]] = Field(None, description="仅处理的条目列表（缺省时处理全部条目）")
+    contextLength: int = Field(1680, description="上下文长度")
+    predictionLength: int = Field(64, description="预测步数（moirai-2.0-R-small最大建议64）")
+    batchSize: int = Field(8, description="预测批大小")
+    lowerQuantile: float = Field(0.1, description="下分位（例如 0.1）")
+    upperQuantile: float = Field(0.9, description="上分位（例如 0.9）")
+    freq: str = Field("H", description="时间频率，例如 H, 15min, D")
+    aggregation: Optional[Literal["mean", "sum", "last", "max"]] = Field(None, description="重采样聚合方式；指定时先将源数据按 freq 聚合后再推理")
+    stream: bool = Field(False, description="是否以 NDJSON 逐条目流式返回")
+
+
+class PanelForecastItem(BaseModel):
+    itemId: str
+    median: List[float]
+    lower: List[float]
+    upper: List[float]
+    timestamps: Optional[List[str]] = None
+    usedPredictionLength: int
+    usedContextLength: int
+
+
+class PanelForecastResponse(BaseModel):
+    items: List[PanelForecastItem]
+    meta: dict
+
+
+def _stream_ndjson(results: Iterator[Dict], task_code: str, sink_id: int):
+    """将逐条目结果以 NDJSON 输出；流结束后移除本次请求的日志 sink。"""
+    count = 0
+    try:
+        for r in results:
+            count += 1
+            yield json.dumps(r, ensure_ascii=False) + "\n"
+        logger.info("流式输出完成，taskCode={}，条目数={}", task_code, count)
+    except Exception as e:
+        logger.exception("流式输出中断，taskCode={}：{}", task_code, e)
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+    finally:
+        try:
+            logger.remove(sink_id)
+        except Exception:
+            pass
+
+
+def _forecast_config(req: ForecastRequest) -> dict:
+    """将预测请求规整为预计算存储使用的配置（已补全缺省的上下文长度与预测步数）。"""
+    lengths = _resolve_lengths(req)
+    return make_forecast_config(
+        csv_path=req.datasetPath,
+        target_column=req.targetColumn,
+        feature=req.feature,
+        context_length=lengths["context_length"],
+        prediction_length=lengths["prediction_length"],
+        batch_size=req.batchSize,
+        lower_q=req.lowerQuantile,
+        upper_q=req.upperQuantile,
+        freq=req.freq,
+        train_ratio=req.trainRatio,
+        aggregation=req.aggregation,
+    )
+
+
+def _resolve_lengths(req, with_stride: bool = False) -> dict:
+    """补全缺省的上下文长度/预测步数/步长：优先取 /sweep 保存的推荐值，否则使用内置默认值。"""
+    stride = req.stride if with_stride else None
+    stored = {}
+    if req.contextLength is None or req.predictionLength is None or (with_stride and stride is None):
+        stored = load_sweep_default(
+            req.datasetPath, req.targetColumn, req.feature, req.freq, req.aggregation
+        ) or {}
+        if stored:
+            logger.info("使用已保存的超参推荐配置：{}", stored)
+    # 推荐步长仅在预测步数同样取自推荐配置时沿用，否则随预测步数
+    if with_stride and stride is None and req.predictionLength is None:
+        stride = stored.get("stride")
+    return {
+        "context_length": req.contextLength if req.contextLength is not None else stored.get("contextLength", 1680),
+        "prediction_length": req.predictionLength if req.predictionLength is not None else stored.get("predictionLength", 64),
+        "stride": stride,
+    }
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -88,16 +272,30 @@ def evaluate(req: EvaluateRequest):
     sink_id = logger.add(log_file, enqueue=True, backtrace=False, diagnose=False, level="INFO")
     try:
         logger.info("评估接口开始，taskCode={}，请求载荷={}", req.taskCode, req.model_dump())
-        result = evaluate_dataset_mse_mae(
-            csv_path=req.datasetPath,
-            target_column=req.targetColumn,
-            feature=req.feature,
-            context_length=req.contextLength,
-            prediction_length=req.predictionLength,
-            batch_size=req.batchSize,
-            freq=req.freq,
-            train_ratio=req.trainRatio,
-        )
+        lengths = _resolve_lengths(req, with_stride=True)
+        # 剖析只覆盖当前进程：开启剖析时改为串行，确保前向计算被记录
+        shards = 1 if req.profile else req.shards
+        if req.profile and req.shards > 1:
+            logger.info("已开启剖析，忽略 shards={}，改为串行评估，taskCode={}", req.shards, req.taskCode)
+        with profile_task(logs_dir, req.taskCode, req.profile) as prof:
+            result = evaluate_dataset_mse_mae(
+                csv_path=req.datasetPath,
+                target_column=req.targetColumn,
+                feature=req.feature,
+                context_length=lengths["context_length"],
+                prediction_length=lengths["prediction_length"],
+                batch_size=req.batchSize,
+                freq=req.freq,
+                train_ratio=req.trainRatio,
+                stride=lengths["stride"],
+                aggregation=req.aggregation,
+                shards=shards,
+            )
+        if prof is not None:
+            if req.shards > 1:
+                prof["requestedShards"] = req.shards
+                prof["note"] = "剖析模式下已串行执行，未使用分片并行"
+            result["meta"]["profile"] = prof
         logger.info("评估成功，taskCode={}，指标摘要：mse={}，mae={}", req.taskCode, result.get("mse"), result.get("mae"))
         return EvaluateResponse(**result)
     except Exception as e:
@@ -119,22 +317,68 @@ def forecast(req: ForecastRequest):
     sink_id = logger.add(log_file, enqueue=True, backtrace=False, diagnose=False, level="INFO")
     try:
         logger.info("预测接口开始，taskCode={}，请求载荷={}", req.taskCode, req.model_dump())
-        result = forecast_with_quantiles(
+        config = _forecast_config(req)
+        # 剖析请求始终走实时推理
+        cached = None if req.profile else precompute_store.lookup(config)
+        if cached is not None:
+            logger.info("命中预计算结果，taskCode={}，新鲜度={}", req.taskCode, cached["meta"]["precompute"])
+            return ForecastResponse(**cached)
+        # 未命中：实时推理；若配置已登记则写回存储（签名在读取数据前获取）
+        signature = file_signature(config["csv_path"])
+        with profile_task(logs_dir, req.taskCode, req.profile) as prof:
+            result = forecast_with_quantiles(**config)
+        stored = precompute_store.put(config, result, signature)
+        result = {**result, "meta": {**result["meta"], "precompute": {"hit": False, "stored": stored}}}
+        if prof is not None:
+            result["meta"]["profile"] = prof
+        logger.info("预测成功，taskCode={}，使用的预测步数={}，上下文长度={}", req.taskCode, result.get("usedPredictionLength"), result.get("usedContextLength"))
+        return ForecastResponse(**result)
+    except Exception as e:
+        logger.exception("预测失败，taskCode={}：{}", req.taskCode, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        try:
+            logger.remove(sink_id)
+        except Exception:
+            pass
+
+
+@app.post("/sweep", response_model=SweepResponse)
+def sweep(req: SweepRequest):
+    # 为本次请求创建独立日志文件
+    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    log_file = os.path.join(logs_dir, f"{req.taskCode}.log")
+    sink_id = logger.add(log_file, enqueue=True, backtrace=False, diagnose=False, level="INFO")
+    try:
+        logger.info("超参扫描接口开始，taskCode={}，请求载荷={}", req.taskCode, req.model_dump())
+        result = sweep_dataset_mse_mae(
             csv_path=req.datasetPath,
             target_column=req.targetColumn,
             feature=req.feature,
-            context_length=req.contextLength,
-            prediction_length=req.predictionLength,
+            context_lengths=req.contextLengths,
+            prediction_lengths=req.predictionLengths,
+            strides=req.strides,
             batch_size=req.batchSize,
-            lower_q=req.lowerQuantile,
-            upper_q=req.upperQuantile,
             freq=req.freq,
             train_ratio=req.trainRatio,
+            rank_by=req.rankBy,
+            aggregation=req.aggregation,
         )
-        logger.info("预测成功，taskCode={}，使用的预测步数={}，上下文长度={}", req.taskCode, result.get("usedPredictionLength"), result.get("usedContextLength"))
-        return ForecastResponse(**result)
+        best = result["recommended"]
+        if req.saveAsDefault:
+            save_sweep_default(
+                req.datasetPath,
+                req.targetColumn,
+                req.feature,
+                req.freq,
+                req.aggregation,
+                {k: best[k] for k in ("contextLength", "predictionLength", "stride")},
+            )
+        logger.info("超参扫描成功，taskCode={}，配置数={}，推荐配置={}", req.taskCode, len(result["results"]), best)
+        return SweepResponse(savedAsDefault=req.saveAsDefault, **result)
     except Exception as e:
-        logger.exception("预测失败，taskCode={}：{}", req.taskCode, e)
+        logger.exception("超参扫描失败，taskCode={}：{}", req.taskCode, e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         try:
@@ -143,6 +387,136 @@ def forecast(req: ForecastRequest):
             pass
 
 
+@app.post("/evaluate-panel", response_model=PanelEvaluateResponse)
+def evaluate_panel_endpoint(req: PanelEvaluateRequest):
+    # 为本次请求创建独立日志文件
+    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    log_file = os.path.join(logs_dir, f"{req.taskCode}.log")
+    sink_id = logger.add(log_file, enqueue=True, backtrace=False, diagnose=False, level="INFO")
+    streaming = False
+    try:
+        logger.info("长表评估接口开始，taskCode={}，请求载荷={}", req.taskCode, req.model_dump())
+        results = evaluate_panel(
+            csv_path=req.datasetPath,
+            item_column=req.itemColumn,
+            target_column=req.targetColumn,
+            items=req.items,
+            context_length=req.contextLength,
+            prediction_length=req.predictionLength,
+            batch_size=req.batchSize,
+            freq=req.freq,
+            stride=req.stride,
+            aggregation=req.aggregation,
+        )
+        if req.stream:
+            # 先取首个结果，使读取/解析错误仍以 500 返回
+            first = next(results)
+            streaming = True
+            return StreamingResponse(
+                _stream_ndjson(chain([first], results), req.taskCode, sink_id),
+                media_type="application/x-ndjson",
+            )
+        items = list(results)
+        scored = [r for r in items if "error" not in r]
+        points = sum(r["points"] for r in scored)
+        mse = sum(r["mse"] * r["points"] for r in scored) / points if points else None
+        mae = sum(r["mae"] * r["points"] for r in scored) / points if points else None
+        logger.info("长表评估成功，taskCode={}，条目数={}，mse={}，mae={}", req.taskCode, len(items), mse, mae)
+        return PanelEvaluateResponse(
+            mse=mse,
+            mae=mae,
+            items=items,
+            meta={"items": len(items), "evaluated_items": len(scored), "points": int(points)},
+        )
+    except Exception as e:
+        logger.exception("长表评估失败，taskCode={}：{}", req.taskCode, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if not streaming:
+            try:
+                logger.remove(sink_id)
+            except Exception:
+                pass
+
+
+@app.post("/forecast-panel", response_model=PanelForecastResponse)
+def forecast_panel_endpoint(req: PanelForecastRequest):
+    # 为本次请求创建独立日志文件
+    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    log_file = os.path.join(logs_dir, f"{req.taskCode}.log")
+    sink_id = logger.add(log_file, enqueue=True, backtrace=False, diagnose=False, level="INFO")
+    streaming = False
+    try:
+        logger.info("长表预测接口开始，taskCode={}，请求载荷={}", req.taskCode, req.model_dump())
+        results = forecast_panel(
+            csv_path=req.datasetPath,
+            item_column=req.itemColumn,
+            target_column=req.targetColumn,
+            items=req.items,
+            context_length=req.contextLength,
+            prediction_length=req.predictionLength,
+            batch_size=req.batchSize,
+            lower_q=req.lowerQuantile,
+            upper_q=req.upperQuantile,
+            freq=req.freq,
+            aggregation=req.aggregation,
+        )
+        if req.stream:
+            # 先取首个结果，使读取/解析错误仍以 500 返回
+            first = next(results)
+            streaming = True
+            return StreamingResponse(
+                _stream_ndjson(chain([first], results), req.taskCode, sink_id),
+                media_type="application/x-ndjson",
+            )
+        items = list(results)
+        logger.info("长表预测成功，taskCode={}，条目数={}", req.taskCode, len(items))
+        return PanelForecastResponse(items=items, meta={"items": len(items)})
+    except Exception as e:
+        logger.exception("长表预测失败，taskCode={}：{}", req.taskCode, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if not streaming:
+            try:
+                logger.remove(sink_id)
+            except Exception:
+                pass
+
+
+@app.post("/precompute/register", response_model=PrecomputeRegisterResponse)
+def precompute_register(req: ForecastRequest):
+    """登记数据集与预测配置；登记时同步计算一次，数据文件变更时由后台线程批量重算，`/forecast` 直接读取结果。"""
+    try:
+        config = _forecast_config(req)
+        if not os.path.isfile(config["csv_path"]):
+            raise HTTPException(status_code=404, detail="数据文件不存在")
+        key = precompute_store.register(config)
+        return PrecomputeRegisterResponse(key=key, config=config)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.warning("预计算登记被拒绝，taskCode={}：{}", req.taskCode, e)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("预计算登记失败，taskCode={}：{}", req.taskCode, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/precompute")
+def precompute_list():
+    """列出已登记的预计算配置及其状态（fresh / stale / pending）。"""
+    return {"items": precompute_store.entries()}
+
+
+@app.delete("/precompute/{key}")
+def precompute_unregister(key: str):
+    if not precompute_store.unregister(key):
+        raise HTTPException(status_code=404, detail="预计算配置不存在")
+    return {"key": key, "removed": True}
+
+
 @app.get("/download-log")
 def download_log(taskCode: str, password: str):
     """按 taskCode 下载日志文件，需提供正确密码。"""
@@ -165,6 +539,34 @@ def download_log(taskCode: str, password: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/download-profile")
+def download_profile(taskCode: str, password: str, kind: Literal["cpu", "cpu-raw", "torch", "memory"] = "cpu"):
+    """按 taskCode 下载剖析产物，需提供正确密码。
+
+    - `cpu`：cProfile 文本报告；`cpu-raw`：pstats 二进制（可用 snakeviz 等工具查看）；
+    - `torch`：torch profiler 的 Chrome trace（chrome://tracing 或 Perfetto 打开）；
+    - `memory`：tracemalloc 内存峰值与分配摘要。
+    """
+    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    profile_file = profile_path(logs_dir, taskCode, kind)
+    try:
+        logger.info("剖析结果下载开始，taskCode={}，类型={}", taskCode, kind)
+        if password != settings.log_download_password:
+            logger.warning("剖析结果下载失败，密码错误，taskCode={}", taskCode)
+            raise HTTPException(status_code=403, detail="密码错误")
+        if not os.path.isfile(profile_file):
+            logger.warning("剖析结果不存在，taskCode={}，路径={}", taskCode, profile_file)
+            raise HTTPException(status_code=404, detail="剖析结果不存在")
+        media_type = {"torch": "application/json", "cpu-raw": "application/octet-stream"}.get(kind, "text/plain")
+        logger.info("剖析结果下载成功，taskCode={}，路径={}", taskCode, profile_file)
+        return FileResponse(profile_file, filename=f"{taskCode}.{PROFILE_FILES[kind]}", media_type=media_type)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("剖析结果下载异常，taskCode={}：{}", taskCode, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 if __name__ == "__main__":
     # 作为脚本运行时，使用 uvicorn 启动服务在端口 8217
     import uvicorn
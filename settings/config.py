@@ -21,6 +21,9 @@ class AppSettings:
     - `MOIRAI_MODELS_DIRNAME`：模型目录名，默认 `bin`
     - `MOIRAI_MOIRAI2_LOCAL_DIRNAME`：Moirai2 本地快照目录名，默认 `moirai-2.0-R-small`
     - `MOIRAI_LOG_DOWNLOAD_PASSWORD`：日志下载接口密码，默认 `moirai`
+    - `MOIRAI_STORE_DIRNAME`：本地存储目录名（超参推荐配置、预计算结果等），默认 `store`
+    - `MOIRAI_EVALUATE_MAX_SHARDS`：评估接口并行分片（子进程）数上限，默认为 CPU 核数
+    - `MOIRAI_PRECOMPUTE_POLL_SECONDS`：预计算后台线程轮询数据文件的间隔（秒），默认 `30`；`0` 表示不启动
     """
 
     def __init__(self) -> None:
@@ -29,6 +32,11 @@ class AppSettings:
             "MOIRAI_MOIRAI2_LOCAL_DIRNAME", "moirai-2.0-R-small"
         )
         self.log_download_password: str = os.getenv("MOIRAI_LOG_DOWNLOAD_PASSWORD", "moirai")
+        self.store_dirname: str = os.getenv("MOIRAI_STORE_DIRNAME", "store")
+        self.evaluate_max_shards: int = max(
+            1, int(os.getenv("MOIRAI_EVALUATE_MAX_SHARDS", str(os.cpu_count() or 1)))
+        )
+        self.precompute_poll_seconds: float = float(os.getenv("MOIRAI_PRECOMPUTE_POLL_SECONDS", "30"))
 
 
 # 实例化配置（用于运行时读取）
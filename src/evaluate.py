@@ -10,27 +10,35 @@
 '''
 
 
-from typing import Dict
+import os
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
 
 import numpy as np
+import pandas as pd
+import torch
 from loguru import logger
-from uni2ts.model.moirai2 import Moirai2Forecast, Moirai2Module
+from uni2ts.model.moirai2 import Moirai2Forecast
 
+from settings.config import settings
 from .utils import (
-    resolve_moirai2_local_path,
-    load_csv_target,
-    load_csv_target_and_covariates,
+    load_moirai2_module,
+    load_csv_dataset,
     compute_metadata,
     clip_context_by_available_history,
     enforce_moirai2_small_pred_len,
     compute_metrics,
-    make_sliding_context_and_labels,
-    build_listdataset_from_contexts,
+    make_window_starts,
+    build_listdataset_from_starts,
+    extract_point_forecast,
 )
 
 
 def _init_moirai2(metadata: Dict, context_length: int) -> tuple[Moirai2Forecast, int]:
-    local_dir = resolve_moirai2_local_path()
     used_ctx = clip_context_by_available_history(
         total_len=metadata["total_length"],
         prediction_length=metadata["prediction_length"],
@@ -45,7 +53,7 @@ def _init_moirai2(metadata: Dict, context_length: int) -> tuple[Moirai2Forecast,
     )
 
     model = Moirai2Forecast(
-        module=Moirai2Module.from_pretrained(local_dir),
+        module=load_moirai2_module(),
         prediction_length=metadata["prediction_length"],
         context_length=used_ctx,
         target_dim=metadata["target_dim"],
@@ -55,6 +63,194 @@ def _init_moirai2(metadata: Dict, context_length: int) -> tuple[Moirai2Forecast,
     return model, used_ctx
 
 
+# ---------- 分片并行评估 ----------
+# 子进程内的常驻状态：按模型形状缓存的预测器（共用同一常驻 Moirai2Module）
+_SHARD_STATE: Dict = {}
+_SHARD_PREDICTOR_CACHE_SIZE = 16
+
+# 父进程内常驻的进程池：仅按进程数缓存，跨请求复用（进程数变化时替换）
+_POOL: Dict = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _to_shared(arr: np.ndarray) -> tuple[shared_memory.SharedMemory, tuple]:
+    """将数组拷贝到共享内存，返回共享内存对象与子进程挂载所需的 (name, shape, dtype)。"""
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _attach_shared(spec: tuple, shms: List[shared_memory.SharedMemory]) -> np.ndarray:
+    name, shape, dtype = spec
+    # 共享内存由父进程创建并负责 unlink；子进程只挂载，不改动资源跟踪登记
+    shm = shared_memory.SharedMemory(name=name)
+    shms.append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_shard_worker(num_threads: int) -> None:
+    """子进程初始化：设置 torch 线程数并加载一次模型权重，之后所有任务共用。"""
+    torch.set_num_threads(num_threads)
+    load_moirai2_module()
+
+
+def _shard_predictor(shape: tuple):
+    """子进程：取得（或构建）指定模型形状的预测器；`Moirai2Forecast` 仅包装常驻模块，构建开销很小。"""
+    predictors = _SHARD_STATE.setdefault("predictors", {})
+    predictor = predictors.get(shape)
+    if predictor is None:
+        if len(predictors) >= _SHARD_PREDICTOR_CACHE_SIZE:
+            predictors.clear()
+        used_ctx, prediction_length, target_dim, feat_dim, past_feat_dim, batch_size = shape
+        model = Moirai2Forecast(
+            module=load_moirai2_module(),
+            prediction_length=prediction_length,
+            context_length=used_ctx,
+            target_dim=target_dim,
+            feat_dynamic_real_dim=feat_dim,
+            past_feat_dynamic_real_dim=past_feat_dim,
+        )
+        predictor = model.create_predictor(batch_size=batch_size)
+        predictors[shape] = predictor
+    return predictor
+
+
+def _predict_starts(
+    specs: tuple, shape: tuple, starts: List[int], freq: str, shms: List[shared_memory.SharedMemory]
+) -> np.ndarray:
+    target_spec, covs_spec, dates_spec = specs
+    target = _attach_shared(target_spec, shms)
+    covs = _attach_shared(covs_spec, shms) if covs_spec is not None else None
+    dates = pd.Series(_attach_shared(dates_spec, shms), copy=False) if dates_spec is not None else None
+    context_ds = build_listdataset_from_starts(
+        target, starts, shape[0], freq=freq, dates=dates, past_covs=covs
+    )
+    preds = [extract_point_forecast(fc).reshape(-1) for fc in _shard_predictor(shape).predict(context_ds)]
+    if len(preds) != len(starts):
+        raise RuntimeError(f"预测结果数量不匹配：{len(preds)} 与窗口数 {len(starts)}。")
+    return np.stack(preds)
+
+
+def _predict_shard(specs: tuple, shape: tuple, starts: List[int], freq: str) -> np.ndarray:
+    """子进程：挂载本次请求的共享数据，预测一个分片内的全部窗口，返回 (窗口数, 预测步数) 的点预测。
+
+    - `shape` 为 (上下文长度, 预测步数, 目标维度, 动态特征维度, 历史动态特征维度, batch_size)，随任务传入。
+    """
+    shms: List[shared_memory.SharedMemory] = []
+    try:
+        # 数据视图只存在于 _predict_starts 内，返回后即释放，随后才能关闭共享内存
+        return _predict_starts(specs, shape, starts, freq, shms)
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+def _shard_pool(workers: int) -> ProcessPoolExecutor:
+    """取得（或创建）指定进程数的常驻进程池；子进程在初始化时加载一次模型。
+
+    - 进程池只按进程数区分，模型形状随任务传入，不同上下文长度等配置的请求共用同一进程池；
+    - 调用方需持有 `_POOL_LOCK`。
+    """
+    if _POOL.get("workers") == workers:
+        return _POOL["executor"]
+    old = _POOL.get("executor")
+    if old is not None:
+        # 已提交的任务仍会执行完毕
+        old.shutdown(wait=False)
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info("创建分片进程池：进程数={}，每进程 torch 线程数={}", workers, num_threads)
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_shard_worker,
+        initargs=(num_threads,),
+    )
+    _POOL.update(workers=workers, executor=executor)
+    return executor
+
+
+def shutdown_shard_pool() -> None:
+    """关闭常驻的分片进程池（服务退出时调用）。"""
+    with _POOL_LOCK:
+        executor = _POOL.pop("executor", None)
+        _POOL.pop("workers", None)
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _predict_windows_sharded(
+    raw: np.ndarray,
+    covs: np.ndarray,
+    dates: Optional[pd.Series],
+    starts: List[int],
+    metadata: Dict,
+    used_ctx: int,
+    batch_size: int,
+    freq: str,
+    shards: int,
+) -> List[np.ndarray]:
+    """将窗口按起点顺序切为连续分片，在常驻进程池中并发预测。
+
+    - 分片边界对齐到 `batch_size` 的整数倍，使各批次的窗口组成与串行路径相同；
+    - 数据数组经共享内存传给子进程，不随任务复制；进程池只按进程数跨请求复用，
+      模型形状随任务传入，子进程按形状缓存预测器，模型权重只在子进程启动时加载一次；
+    - 返回各分片的点预测（按窗口顺序），由调用方统一计算指标；`meta.shards` 中各分片的
+      sse/sae 同样由父进程根据返回的点预测计算，子进程不做误差汇总；
+    - 子进程的 torch 线程数与父进程不同，结果与串行路径可能存在浮点末位差异。
+    """
+    batch_size = max(int(batch_size), 1)
+    batches = [starts[i : i + batch_size] for i in range(0, len(starts), batch_size)]
+    edges = np.linspace(0, len(batches), shards + 1, dtype=int)
+    shard_starts = [
+        [int(st) for b in batches[lo:hi] for st in b]
+        for lo, hi in zip(edges[:-1], edges[1:])
+        if hi > lo
+    ]
+    logger.info(
+        "分片并行评估：分片数={}，每分片窗口数={}",
+        len(shard_starts),
+        [len(a) for a in shard_starts],
+    )
+    shape = (
+        int(used_ctx),
+        int(metadata["prediction_length"]),
+        int(metadata["target_dim"]),
+        int(metadata["feat_dynamic_real_dim"]),
+        int(metadata["past_feat_dynamic_real_dim"]),
+        int(batch_size),
+    )
+    pool = None
+    shms = []
+    try:
+        shm, target_spec = _to_shared(raw.astype(float))
+        shms.append(shm)
+        covs_spec = None
+        if covs.size > 0:
+            shm, covs_spec = _to_shared(covs)
+            shms.append(shm)
+        dates_spec = None
+        if dates is not None:
+            shm, dates_spec = _to_shared(dates.to_numpy(dtype="datetime64[ns]"))
+            shms.append(shm)
+        specs = (target_spec, covs_spec, dates_spec)
+        with _POOL_LOCK:
+            # 在锁内取池并提交，避免其他请求替换进程池后提交到已关闭的池
+            pool = _shard_pool(shards)
+            futures = [pool.submit(_predict_shard, specs, shape, st, freq) for st in shard_starts]
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        # 子进程异常退出：丢弃该进程池，下次请求时重建
+        with _POOL_LOCK:
+            if pool is not None and _POOL.get("executor") is pool:
+                _POOL.clear()
+        raise
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+
 def evaluate_dataset_mse_mae(
     csv_path: str,
     target_column: str,
@@ -64,14 +260,14 @@ def evaluate_dataset_mse_mae(
     batch_size: int,
     freq: str,
     train_ratio: float,
+    stride: int | None = None,
+    aggregation: str | None = None,
+    shards: int = 1,
 ) -> Dict:
-    # 准备数据（滑动窗口：覆盖全序列）
-    if feature == "MS":
-        raw, covs, cov_cols = load_csv_target_and_covariates(csv_path, target_column, "date")
-    else:
-        raw = load_csv_target(csv_path, target_column)
-        covs = np.zeros((0, len(raw)), dtype=float)
-        cov_cols = []
+    # 准备数据（滑动窗口：覆盖全序列）；一次读取 CSV，必要时按 freq 重采样
+    raw, covs, dates = load_csv_dataset(
+        csv_path, target_column, feature, "date", freq=freq, aggregation=aggregation
+    )
     prediction_length = enforce_moirai2_small_pred_len(prediction_length)
     metadata = compute_metadata(
         raw,
@@ -82,64 +278,81 @@ def evaluate_dataset_mse_mae(
         future_feat_dim=0,
     )
 
-    # 初始化模型与上下文长度（用于窗口宽度）
-    model, used_ctx = _init_moirai2(metadata, context_length)
-
-    # 生成滑动窗口的上下文与标签对；步长默认为 prediction_length
-    contexts, labels = make_sliding_context_and_labels(
-        target=raw,
-        context_length=used_ctx,
+    # 上下文长度（用于窗口宽度）
+    used_ctx = clip_context_by_available_history(
+        total_len=metadata["total_length"],
         prediction_length=prediction_length,
-        step=prediction_length,
+        context_length=context_length,
     )
-    windows = len(contexts)
+
+    # 滑动窗口只记录起始索引，上下文由推理路径按需切片，不在此复制；步长默认为 prediction_length
+    step = int(stride) if stride else prediction_length
+    starts = make_window_starts(len(raw), used_ctx, prediction_length, step)
+    windows = len(starts)
     if windows == 0:
         raise RuntimeError("无有效滑动窗口；序列长度不足以评估。")
+    # 子进程数同时受窗口数、配置上限与 CPU 核数约束
+    shards = max(1, min(int(shards), windows, settings.evaluate_max_shards, os.cpu_count() or 1))
 
     logger.info(
-        "使用滑动窗口评估：窗口数={}，上下文长度={}，预测步数={}",
+        "使用滑动窗口评估：窗口数={}，上下文长度={}，预测步数={}，步长={}，分片数={}",
         windows,
         used_ctx,
         prediction_length,
+        step,
+        shards,
     )
 
-    # 将所有上下文打包为数据集，批量预测
-    # 为滑动窗口数据集尝试使用 CSV 日期列作为每个窗口的起始时间戳；步长为 prediction_length
-    context_ds = build_listdataset_from_contexts(
-        contexts,
-        freq=freq,
-        csv_path=csv_path,
-        date_column="date",
-        step=prediction_length,
-        past_covs=covs if covs is not None and covs.size > 0 else None,
-        context_length=used_ctx,
-    )
-    predictor = model.create_predictor(batch_size=batch_size)
-    forecasts = list(predictor.predict(context_ds))
-    if len(forecasts) != windows:
-        raise RuntimeError(
-            f"预测结果数量不匹配：{len(forecasts)} 与窗口数 {windows}。"
+    if shards > 1:
+        shard_preds = _predict_windows_sharded(
+            raw, covs, dates, starts, metadata, used_ctx, batch_size, freq, shards
         )
+        preds = [p for block in shard_preds for p in block]
+    else:
+        # 将所有上下文打包为数据集，批量预测
+        # 为滑动窗口数据集使用日期列作为每个窗口的起始时间戳；步长为 step
+        model, _ = _init_moirai2(metadata, used_ctx)
+        context_ds = build_listdataset_from_starts(
+            raw,
+            starts,
+            used_ctx,
+            freq=freq,
+            dates=dates,
+            past_covs=covs if covs.size > 0 else None,
+        )
+        predictor = model.create_predictor(batch_size=batch_size)
+        forecasts = list(predictor.predict(context_ds))
+        if len(forecasts) != windows:
+            raise RuntimeError(
+                f"预测结果数量不匹配：{len(forecasts)} 与窗口数 {windows}。"
+            )
+
+        # 提取每个窗口的预测中位数（若无分位数，则退化为均值或样本均值）
+        preds = [extract_point_forecast(fc) for fc in forecasts]
 
-    # 提取每个窗口的预测中位数（若无分位数，则退化为均值或样本均值）
-    preds = []
-    for fc in forecasts:
-        if hasattr(fc, "quantile"):
-            p = np.array(fc.quantile(0.5))
-        elif hasattr(fc, "mean") and fc.mean is not None:
-            p = np.array(fc.mean)
-        elif hasattr(fc, "samples") and fc.samples is not None:
-            p = np.array(fc.samples).mean(axis=0)
-        else:
-            raise RuntimeError("不支持的预测对象格式。")
-        preds.append(p.squeeze())
-
-    # 展平聚合所有预测与标签，得到全序列评估
+    # 展平聚合所有预测与标签，得到全序列评估（分片结果按窗口顺序拼接）
     y_pred = np.concatenate([p.reshape(-1) for p in preds], axis=0)
-    y_true = np.concatenate([l.reshape(-1) for l in labels], axis=0)
+    label_idx = np.asarray(starts)[:, None] + used_ctx + np.arange(prediction_length)
+    y_true = raw[label_idx].astype(float).reshape(-1)
 
     mse, mae = compute_metrics(y_true, y_pred)
 
+    if shards > 1:
+        # 各分片的误差平方和与绝对误差和（在父进程中由各分片返回的点预测计算，仅供诊断）
+        bounds = np.cumsum([0] + [b.size for b in shard_preds])
+        err = y_true - y_pred
+        metadata["shards"] = [
+            {
+                "windows": int(len(b)),
+                "sse": float(np.sum(err[lo:hi] ** 2)),
+                "sae": float(np.sum(np.abs(err[lo:hi]))),
+            }
+            for b, lo, hi in zip(shard_preds, bounds[:-1], bounds[1:])
+        ]
+
+    if aggregation is not None:
+        metadata["resample"] = {"freq": freq, "aggregation": aggregation}
+
     return {
         "mse": mse,
         "mae": mae,
@@ -147,6 +360,7 @@ def evaluate_dataset_mse_mae(
         "points": int(y_true.shape[0]),
         "usedPredictionLength": int(prediction_length),
         "usedContextLength": int(used_ctx),
+        "usedStride": int(step),
         "targetDim": int(metadata["target_dim"]),
         "meta": metadata,
     }
@@ -10,42 +10,25 @@
 '''
 
 
-from typing import Dict
+from typing import Dict, List
 
-import numpy as np
 from loguru import logger
-from uni2ts.model.moirai2 import Moirai2Forecast, Moirai2Module
+from gluonts.dataset.common import ListDataset
+from uni2ts.model.moirai2 import Moirai2Forecast
 
 from .utils import (
-    resolve_moirai2_local_path,
-    load_csv_target,
-    load_csv_target_and_covariates,
-    build_context_only_listdataset,
+    load_moirai2_module,
+    load_csv_frame,
+    split_frame,
+    make_context_only_entry,
     compute_metadata,
     clip_context_for_extrapolation,
     enforce_moirai2_small_pred_len,
+    future_timestamps,
+    extract_quantile_forecast,
 )
 
 
-def _init_moirai2(metadata: Dict, context_length: int) -> tuple[Moirai2Forecast, int]:
-    local_dir = resolve_moirai2_local_path()
-    # 纯外推模式：只根据总长度裁剪上下文，不保留预测窗口
-    used_ctx = clip_context_for_extrapolation(
-        total_len=metadata["total_length"],
-        context_length=context_length,
-    )
-
-    model = Moirai2Forecast(
-        module=Moirai2Module.from_pretrained(local_dir),
-        prediction_length=metadata["prediction_length"],
-        context_length=used_ctx,
-        target_dim=metadata["target_dim"],
-        feat_dynamic_real_dim=metadata["feat_dynamic_real_dim"],
-        past_feat_dynamic_real_dim=metadata["past_feat_dynamic_real_dim"],
-    )
-    return model, used_ctx
-
-
 def forecast_with_quantiles(
     csv_path: str,
     target_column: str,
@@ -57,69 +40,104 @@ def forecast_with_quantiles(
     upper_q: float,
     freq: str,
     train_ratio: float,
+    aggregation: str | None = None,
 ):
-    # 准备数据
-    if feature == "MS":
-        raw, covs, cov_cols = load_csv_target_and_covariates(csv_path, target_column, "date")
-    else:
-        raw = load_csv_target(csv_path, target_column)
-        covs = None
-    prediction_length = enforce_moirai2_small_pred_len(prediction_length)
-    metadata = compute_metadata(
-        raw,
-        train_ratio,
-        prediction_length,
-        feature=feature,
-        past_feat_dim=(covs.shape[0] if covs is not None else 0),
-        future_feat_dim=0,
-    )
+    """单组配置的未来外推预测。
+
+    - 委托给 `forecast_many_with_quantiles`，与预计算共用同一条构建路径，命中与未命中的结果一致。
+    """
+    result = forecast_many_with_quantiles(csv_path, [{
+        "target_column": target_column,
+        "feature": feature,
+        "context_length": context_length,
+        "prediction_length": prediction_length,
+        "batch_size": batch_size,
+        "lower_q": lower_q,
+        "upper_q": upper_q,
+        "freq": freq,
+        "train_ratio": train_ratio,
+        "aggregation": aggregation,
+    }])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
 
-    # 初始化并执行预测（仅使用末尾上下文进行未来外推）
-    model, used_ctx = _init_moirai2(metadata, context_length)
-    predictor = model.create_predictor(batch_size=batch_size)
-    # 单窗口外推：尝试使用 CSV 日期列作为起始时间戳；失败则降级为占位时间戳
-    context_ds = build_context_only_listdataset(
-        raw,
-        freq=freq,
-        used_ctx=used_ctx,
-        csv_path=csv_path,
-        date_column="date",
-        past_covs=covs if covs is not None and covs.size > 0 else None,
-    )
-    forecasts = list(predictor.predict(context_ds))
-    if not forecasts:
-        raise RuntimeError("未产生任何预测结果。")
-    fc = forecasts[0]
+def forecast_many_with_quantiles(csv_path: str, configs: List[Dict]) -> List[Dict]:
+    """对同一 CSV 的多组预测配置批量外推预测。
 
-    # 提取分位数与中位数
-    if hasattr(fc, "quantile"):
-        median = np.array(fc.quantile(0.5)).tolist()
-        lower = np.array(fc.quantile(lower_q)).tolist()
-        upper = np.array(fc.quantile(upper_q)).tolist()
-    else:
-        # 兜底：以均值作为中位数；若存在样本，则用 ±1 标准差作为上下界
-        if hasattr(fc, "mean") and fc.mean is not None:
-            m = np.array(fc.mean)
-        elif hasattr(fc, "samples") and fc.samples is not None:
-            m = np.array(fc.samples).mean(axis=0)
-        else:
-            raise RuntimeError("不支持的预测对象：不存在分位数、均值或样本。")
-        median = m.squeeze().tolist()
-        if hasattr(fc, "samples") and fc.samples is not None:
-            s = np.array(fc.samples)
-            std = s.std(axis=0)
-            lower = (m - std).squeeze().tolist()
-            upper = (m + std).squeeze().tolist()
-        else:
-            lower = median
-            upper = median
+    - `configs` 中每项为 `forecast_with_quantiles` 的关键字参数（`csv_path` 除外）；
+    - CSV 按 (freq, aggregation) 只读取一次；模型形状相同（上下文长度、预测步数、协变量维度、频率）
+      的配置合并为一次批量推理；
+    - 返回与 `configs` 等长的列表，单项失败时该位置为异常对象，不影响其他配置。
+    """
+    frames: Dict[tuple, object] = {}
+    results: List = [None] * len(configs)
+    groups: Dict[tuple, List[tuple]] = {}
+    for i, cfg in enumerate(configs):
+        try:
+            fkey = (cfg["freq"], cfg.get("aggregation"))
+            if fkey not in frames:
+                frames[fkey] = load_csv_frame(csv_path, "date", freq=cfg["freq"], aggregation=cfg.get("aggregation"))
+            raw, covs, dates = split_frame(frames[fkey], cfg["target_column"], cfg["feature"], "date")
+            prediction_length = enforce_moirai2_small_pred_len(cfg["prediction_length"])
+            metadata = compute_metadata(
+                raw,
+                cfg["train_ratio"],
+                prediction_length,
+                feature=cfg["feature"],
+                past_feat_dim=covs.shape[0],
+                future_feat_dim=0,
+            )
+            used_ctx = clip_context_for_extrapolation(len(raw), cfg["context_length"])
+            if used_ctx <= 0:
+                raise ValueError("used_ctx 必须大于 0。")
+            entry = make_context_only_entry(raw, used_ctx, dates=dates, past_covs=covs if covs.size > 0 else None)
+            gkey = (used_ctx, prediction_length, covs.shape[0], cfg["freq"])
+            groups.setdefault(gkey, []).append((i, entry, metadata, dates))
+        except Exception as e:
+            logger.warning("批量预测配置准备失败，索引={}：{}", i, e)
+            results[i] = e
 
-    return {
-        "median": median,
-        "lower": lower,
-        "upper": upper,
-        "usedPredictionLength": int(prediction_length),
-        "usedContextLength": int(used_ctx),
-        "targetDim": int(metadata["target_dim"]),
-        "meta": metadata,
-    }
+    for (used_ctx, prediction_length, past_dim, freq), members in groups.items():
+        logger.info(
+            "批量外推预测：上下文长度={}，预测步数={}，配置数={}",
+            used_ctx,
+            prediction_length,
+            len(members),
+        )
+        try:
+            model = Moirai2Forecast(
+                module=load_moirai2_module(),
+                prediction_length=prediction_length,
+                context_length=used_ctx,
+                target_dim=1,
+                feat_dynamic_real_dim=0,
+                past_feat_dynamic_real_dim=past_dim,
+            )
+            batch_size = max(int(configs[members[0][0]].get("batch_size", 8)), 1)
+            predictor = model.create_predictor(batch_size=batch_size)
+            forecasts = list(predictor.predict(ListDataset([m[1] for m in members], freq=freq)))
+            if len(forecasts) != len(members):
+                raise RuntimeError(f"预测结果数量不匹配：{len(forecasts)} 与配置数 {len(members)}。")
+        except Exception as e:
+            logger.warning("批量外推预测失败：{}", e)
+            for i, *_ in members:
+                results[i] = e
+            continue
+        for (i, _, metadata, dates), fc in zip(members, forecasts):
+            cfg = configs[i]
+            median, lower, upper = extract_quantile_forecast(fc, cfg["lower_q"], cfg["upper_q"])
+            if cfg.get("aggregation") is not None:
+                metadata["resample"] = {"freq": freq, "aggregation": cfg["aggregation"]}
+            results[i] = {
+                "median": median,
+                "lower": lower,
+                "upper": upper,
+                "timestamps": future_timestamps(dates, freq, prediction_length),
+                "usedPredictionLength": int(prediction_length),
+                "usedContextLength": int(used_ctx),
+                "targetDim": int(metadata["target_dim"]),
+                "meta": metadata,
+            }
+    return results
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   panel.py
+@Time    :   2025/11/24 09:41:05
+@Author  :   kaixinpangpangyu
+@Version :   1.0
+@Contact :   wangjinbo_0217@163.com
+@Motto   :   Innovate Today
+'''
+
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from gluonts.dataset.common import ListDataset
+from uni2ts.model.moirai2 import Moirai2Forecast
+
+from .utils import (
+    load_moirai2_module,
+    load_long_csv_panel,
+    clip_context_by_available_history,
+    clip_context_for_extrapolation,
+    enforce_moirai2_small_pred_len,
+    make_window_starts,
+    extract_point_forecast,
+    extract_quantile_forecast,
+    future_timestamps,
+)
+
+
+_DEFAULT_TS = pd.Timestamp("2000-01-01 00:00:00")
+
+
+def _make_predictor(context_length: int, prediction_length: int, batch_size: int):
+    model = Moirai2Forecast(
+        module=load_moirai2_module(),
+        prediction_length=prediction_length,
+        context_length=context_length,
+        target_dim=1,
+        feat_dynamic_real_dim=0,
+        past_feat_dynamic_real_dim=0,
+    )
+    return model.create_predictor(batch_size=batch_size)
+
+
+def _entry(target: np.ndarray, dates: Optional[np.ndarray], start_idx: int, context_length: int) -> Dict:
+    start = pd.Timestamp(dates[start_idx]) if dates is not None else _DEFAULT_TS
+    return {"start": start, "target": target[start_idx : start_idx + context_length]}
+
+
+def _warn_padded(short: int, total: int, context_length: int) -> None:
+    """条目级的历史不足不逐条记录日志，按请求汇总为一条告警。"""
+    if short > 0:
+        logger.warning(
+            "{}/{} 个条目的历史长度不足上下文长度 {}，已由预测器左侧补齐并屏蔽（实际值见各条目 usedContextLength）。",
+            short,
+            total,
+            context_length,
+        )
+
+
+def forecast_panel(
+    csv_path: str,
+    item_column: str,
+    target_column: str,
+    items: Optional[List[str]],
+    context_length: int,
+    prediction_length: int,
+    batch_size: int,
+    lower_q: float,
+    upper_q: float,
+    freq: str,
+    aggregation: Optional[str] = None,
+) -> Iterator[Dict]:
+    """对长表中的每个条目做未来外推预测，逐条目产出结果。
+
+    - 文件只解析一次；所有条目共用一个按统一上下文长度构建的预测器，一次批量推理；
+    - 历史短于上下文长度的条目直接送入全部历史，由预测器的实例切分在左侧补齐并标记为缺失，
+      不按长度拆分成多个小批次。
+    """
+    panel = load_long_csv_panel(
+        csv_path, item_column, target_column, "date", items=items, freq=freq, aggregation=aggregation
+    )
+    if not panel:
+        raise RuntimeError("未找到任何条目。")
+    prediction_length = enforce_moirai2_small_pred_len(prediction_length)
+
+    lengths = [len(target) for _, target, _ in panel]
+    # 统一上下文长度不超过最长条目的历史长度
+    used_ctx = clip_context_for_extrapolation(max(lengths), context_length)
+    _warn_padded(sum(n < used_ctx for n in lengths), len(panel), used_ctx)
+
+    logger.info("条目批量预测：上下文长度={}，条目数={}", used_ctx, len(panel))
+    predictor = _make_predictor(used_ctx, prediction_length, batch_size)
+    entries = [_entry(target, dates, max(len(target) - used_ctx, 0), used_ctx) for _, target, dates in panel]
+    for (item_id, target, dates), fc in zip(panel, predictor.predict(ListDataset(entries, freq=freq))):
+        median, lower, upper = extract_quantile_forecast(fc, lower_q, upper_q)
+        yield {
+            "itemId": item_id,
+            "median": median,
+            "lower": lower,
+            "upper": upper,
+            "timestamps": future_timestamps(dates, freq, prediction_length),
+            "usedPredictionLength": int(prediction_length),
+            "usedContextLength": int(min(used_ctx, len(target))),
+        }
+
+
+def evaluate_panel(
+    csv_path: str,
+    item_column: str,
+    target_column: str,
+    items: Optional[List[str]],
+    context_length: int,
+    prediction_length: int,
+    batch_size: int,
+    freq: str,
+    stride: Optional[int] = None,
+    aggregation: Optional[str] = None,
+) -> Iterator[Dict]:
+    """对长表中的每个条目做滑动窗口评估，逐条目产出 MSE/MAE。
+
+    - 所有条目的全部窗口合并为一个数据集，由同一预测器批量推理；
+      可用历史短于上下文长度的条目以其全部可用历史作为上下文，由预测器左侧补齐并屏蔽；
+    - 预测按条目顺序流式返回，某条目的窗口全部完成后立即产出其指标。
+    """
+    panel = load_long_csv_panel(
+        csv_path, item_column, target_column, "date", items=items, freq=freq, aggregation=aggregation
+    )
+    if not panel:
+        raise RuntimeError("未找到任何条目。")
+    prediction_length = enforce_moirai2_small_pred_len(prediction_length)
+    step = int(stride) if stride else prediction_length
+
+    # 统一上下文长度不超过各条目中最长的可用历史
+    used_ctx = clip_context_by_available_history(
+        max(len(target) for _, target, _ in panel), prediction_length, context_length
+    )
+    used: List[Tuple[int, int]] = []
+    for idx, (item_id, target, _) in enumerate(panel):
+        item_ctx = min(used_ctx, len(target) - prediction_length)
+        if item_ctx <= 0:
+            yield {"itemId": item_id, "error": "序列长度不足以评估。"}
+            continue
+        used.append((idx, item_ctx))
+    if not used:
+        return
+    _warn_padded(sum(item_ctx < used_ctx for _, item_ctx in used), len(used), used_ctx)
+
+    owners: List[Tuple[int, int, int]] = []
+    entries = []
+    for i, item_ctx in used:
+        _, target, dates = panel[i]
+        for start in make_window_starts(len(target), item_ctx, prediction_length, step):
+            owners.append((i, start, item_ctx))
+            entries.append(_entry(target, dates, start, item_ctx))
+    logger.info(
+        "条目批量评估：上下文长度={}，条目数={}，窗口数={}", used_ctx, len(used), len(entries)
+    )
+    predictor = _make_predictor(used_ctx, prediction_length, batch_size)
+
+    current, current_ctx, sse, sae, windows = None, 0, 0.0, 0.0, 0
+    for (i, start, item_ctx), fc in zip(owners, predictor.predict(ListDataset(entries, freq=freq))):
+        if i != current:
+            if current is not None:
+                yield _item_metrics(panel[current][0], sse, sae, windows, prediction_length, current_ctx, step)
+            current, current_ctx, sse, sae, windows = i, item_ctx, 0.0, 0.0, 0
+        target = panel[i][1]
+        label = target[start + item_ctx : start + item_ctx + prediction_length]
+        err = label - extract_point_forecast(fc).reshape(-1)
+        sse += float(np.sum(err ** 2))
+        sae += float(np.sum(np.abs(err)))
+        windows += 1
+    if current is not None:
+        yield _item_metrics(panel[current][0], sse, sae, windows, prediction_length, current_ctx, step)
+
+
+def _item_metrics(item_id: str, sse: float, sae: float, windows: int, prediction_length: int, used_ctx: int, step: int) -> Dict:
+    points = windows * prediction_length
+    return {
+        "itemId": item_id,
+        "mse": sse / points,
+        "mae": sae / points,
+        "windows": int(windows),
+        "points": int(points),
+        "usedPredictionLength": int(prediction_length),
+        "usedContextLength": int(used_ctx),
+        "usedStride": int(step),
+    }
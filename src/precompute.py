@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   precompute.py
+@Time    :   2025/11/27 14:20:48
+@Author  :   kaixinpangpangyu
+@Version :   1.0
+@Contact :   wangjinbo_0217@163.com
+@Motto   :   Innovate Today
+'''
+
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from settings.config import settings
+from .forecast import forecast_many_with_quantiles
+from .utils import store_dir, write_json_atomic
+
+
+# 影响预测结果的配置字段（batch_size 不影响结果，不参与键计算）
+_KEY_FIELDS = (
+    "csv_path",
+    "target_column",
+    "feature",
+    "context_length",
+    "prediction_length",
+    "lower_q",
+    "upper_q",
+    "freq",
+    "train_ratio",
+    "aggregation",
+)
+
+
+def make_forecast_config(
+    csv_path: str,
+    target_column: str,
+    feature: str,
+    context_length: int,
+    prediction_length: int,
+    batch_size: int,
+    lower_q: float,
+    upper_q: float,
+    freq: str,
+    train_ratio: float,
+    aggregation: Optional[str] = None,
+) -> Dict:
+    """规整一组预测配置（即 `forecast_with_quantiles` 的关键字参数），数据路径统一为绝对路径。"""
+    return {
+        "csv_path": os.path.abspath(csv_path),
+        "target_column": target_column,
+        "feature": feature,
+        "context_length": int(context_length),
+        "prediction_length": int(prediction_length),
+        "batch_size": int(batch_size),
+        "lower_q": float(lower_q),
+        "upper_q": float(upper_q),
+        "freq": freq,
+        "train_ratio": float(train_ratio),
+        "aggregation": aggregation,
+    }
+
+
+def config_key(config: Dict) -> str:
+    payload = json.dumps({k: config.get(k) for k in _KEY_FIELDS}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """数据文件的变更签名（mtime_ns, size）；文件不存在时返回 `None`。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+def _freshness(entry: Dict) -> Dict:
+    """命中结果的新鲜度：计算时间、对应的数据文件修改时间与结果年龄。"""
+    return {
+        "hit": True,
+        "computedAt": _iso(entry["computedAt"]),
+        "sourceModifiedAt": _iso(entry["sourceModifiedAt"]),
+        "ageSeconds": round(time.time() - entry["computedAt"], 3),
+    }
+
+
+class PrecomputeStore:
+    """预测结果预计算存储：登记数据集与预测配置，数据文件变更时后台批量重算。
+
+    - 结果常驻内存并持久化到 `store/precompute/`，服务重启后可直接复用；
+    - 以数据文件的 (mtime, size) 作为版本签名，签名不一致即视为过期，不再对外提供；
+    - 后台线程按 `poll_seconds` 轮询文件签名，同一数据文件的过期配置合并为一次批量预测；
+    - 登记时先同步计算一次，无法计算的配置直接拒绝；登记后因数据变更而失败的配置记录失败时的签名，
+      文件再次变更前不再重试。
+    """
+
+    def __init__(self, root: str, poll_seconds: float) -> None:
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self._registry: Dict[str, Dict] = {}
+        self._results: Dict[str, Dict] = {}
+        # 重算失败的配置 -> 失败时的数据文件签名（仅内存，重启后会重试一次）
+        self._failed: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+
+    # ---------- 持久化 ----------
+    def _registry_path(self) -> str:
+        return os.path.join(self.root, "registry.json")
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.root, "results", f"{key}.json")
+
+    def _load(self) -> None:
+        try:
+            if os.path.isfile(self._registry_path()):
+                with open(self._registry_path(), "r", encoding="utf-8") as f:
+                    self._registry = json.load(f)
+            for key in self._registry:
+                path = self._result_path(key)
+                if os.path.isfile(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                    entry["signature"] = tuple(entry["signature"])
+                    self._results[key] = entry
+            if self._registry:
+                logger.info("已加载预计算登记 {} 项，已有结果 {} 项", len(self._registry), len(self._results))
+        except Exception as e:
+            logger.warning("加载预计算存储失败，忽略；原因：{}", e)
+
+    # ---------- 登记 ----------
+    def register(self, config: Dict) -> str:
+        """登记配置并同步计算一次结果；配置无法计算（如目标列不存在或非数值）时抛出 `ValueError`。"""
+        key = config_key(config)
+        signature = file_signature(config["csv_path"])
+        result = forecast_many_with_quantiles(config["csv_path"], [config])[0]
+        if isinstance(result, Exception):
+            raise ValueError(f"预测配置无法计算：{result}")
+        with self._lock:
+            self._registry[key] = config
+            self._failed.pop(key, None)
+            write_json_atomic(self._registry_path(), self._registry)
+        self.put(config, result, signature)
+        logger.info("已登记预计算配置：key={}，配置={}", key, config)
+        return key
+
+    def unregister(self, key: str) -> bool:
+        with self._lock:
+            if self._registry.pop(key, None) is None:
+                return False
+            self._results.pop(key, None)
+            self._failed.pop(key, None)
+            write_json_atomic(self._registry_path(), self._registry)
+        try:
+            os.remove(self._result_path(key))
+        except OSError:
+            pass
+        logger.info("已取消预计算登记：key={}", key)
+        return True
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._registry.items())
+            results = dict(self._results)
+            failed = dict(self._failed)
+        out = []
+        for key, config in items:
+            entry = results.get(key)
+            sig = file_signature(config["csv_path"])
+            if sig is not None and failed.get(key) == sig:
+                status = "failed"
+            elif entry is None:
+                status = "pending"
+            elif entry["signature"] != sig:
+                status = "stale"
+            else:
+                status = "fresh"
+            out.append({
+                "key": key,
+                "config": config,
+                "status": status,
+                "computedAt": _iso(entry["computedAt"]) if entry else None,
+            })
+        return out
+
+    # ---------- 读写结果 ----------
+    def lookup(self, config: Dict) -> Optional[Dict]:
+        """读取与当前数据文件版本一致的预计算结果；未命中或已过期返回 `None`。"""
+        key = config_key(config)
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry["signature"] != file_signature(config["csv_path"]):
+            # 数据已变更但尚未重算：不提供过期结果，并唤醒后台线程
+            self._wake.set()
+            return None
+        result = copy.deepcopy(entry["result"])
+        result["meta"]["precompute"] = _freshness(entry)
+        return result
+
+    def put(self, config: Dict, result: Dict, signature: Optional[Tuple[int, int]]) -> bool:
+        """写入结果（仅限已登记配置）；`signature` 应在读取数据文件之前获取。"""
+        key = config_key(config)
+        if signature is None or key not in self._registry:
+            return False
+        entry = {
+            "result": result,
+            "signature": signature,
+            "computedAt": time.time(),
+            "sourceModifiedAt": signature[0] / 1e9,
+        }
+        with self._lock:
+            if key not in self._registry:
+                return False
+            self._results[key] = entry
+        write_json_atomic(self._result_path(key), {**entry, "signature": list(signature)})
+        return True
+
+    # ---------- 后台重算 ----------
+    def refresh_once(self) -> int:
+        """重算所有过期或尚无结果的配置，返回成功重算的数量。"""
+        with self._lock:
+            items = list(self._registry.items())
+            results = dict(self._results)
+            failed = dict(self._failed)
+        by_path: Dict[str, List[Tuple[str, Dict]]] = {}
+        signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        for key, config in items:
+            path = config["csv_path"]
+            if path not in signatures:
+                signatures[path] = file_signature(path)
+            entry = results.get(key)
+            if signatures[path] is None or failed.get(key) == signatures[path]:
+                # 文件不存在，或该版本的数据已确认无法计算：等待文件再次变更
+                continue
+            if entry is None or entry["signature"] != signatures[path]:
+                by_path.setdefault(path, []).append((key, config))
+
+        refreshed = 0
+        for path, members in by_path.items():
+            logger.info("数据文件已变更，批量重算预测：{}，配置数={}", path, len(members))
+            outputs = forecast_many_with_quantiles(path, [cfg for _, cfg in members])
+            for (key, config), out in zip(members, outputs):
+                if isinstance(out, Exception):
+                    logger.warning("预计算失败，数据文件再次变更前不再重试，key={}：{}", key, out)
+                    with self._lock:
+                        if key in self._registry:
+                            self._failed[key] = signatures[path]
+                    continue
+                if self.put(config, out, signatures[path]):
+                    with self._lock:
+                        self._failed.pop(key, None)
+                    refreshed += 1
+        return refreshed
+
+    def _run(self) -> None:
+        logger.info("预计算后台线程已启动，轮询间隔={} 秒", self.poll_seconds)
+        while not self._stop.is_set():
+            # 先清除再重算：重算期间到达的唤醒（新登记、lookup 发现过期）会保留到下一轮
+            self._wake.clear()
+            try:
+                self.refresh_once()
+            except Exception as e:
+                logger.exception("预计算轮询异常：{}", e)
+            self._wake.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        if self.poll_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="precompute-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# 全局预计算存储（服务启动时由 app 启动后台线程）
+precompute_store = PrecomputeStore(store_dir("precompute"), settings.precompute_poll_seconds)
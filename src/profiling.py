@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   profiling.py
+@Time    :   2025/12/02 11:05:37
+@Author  :   kaixinpangpangyu
+@Version :   1.0
+@Contact :   wangjinbo_0217@163.com
+@Motto   :   Innovate Today
+'''
+
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import torch
+from loguru import logger
+
+
+# 剖析产物文件后缀（与 taskCode.log 同目录）
+PROFILE_FILES = {
+    "cpu": "cprofile.txt",
+    "cpu-raw": "cprofile.prof",
+    "torch": "torch-trace.json",
+    "memory": "tracemalloc.txt",
+}
+
+# tracemalloc 与 torch profiler 均为进程级且只能同时开启一份：剖析请求之间串行执行。
+# 该锁不约束未开启剖析的请求，与之并发执行的请求仍会计入 torch trace 与内存峰值（cProfile 仅记录当前线程）
+_PROFILE_LOCK = threading.Lock()
+
+# 写入 meta.profile 的采集范围说明
+_PROFILE_SCOPE = "cProfile 仅记录本请求线程；torch trace 与 tracemalloc 为进程级，剖析期间并发执行的其他请求也会计入"
+
+# 内存采样间隔（秒）与触发新快照所需的增幅：相对上次快照时的占用既要增长 5%，也要至少增长 16 MB。
+# take_snapshot 持有 GIL 遍历全部已跟踪的内存块，会拖慢被剖析的线程，因此同时限制单个请求的快照次数
+_MEMORY_SAMPLE_SECONDS = 0.05
+_MEMORY_SNAPSHOT_GROWTH = 1.05
+_MEMORY_SNAPSHOT_MIN_STEP = 16 * 1024 * 1024
+_MEMORY_SNAPSHOT_MAX_COUNT = 20
+
+
+class _PeakSnapshotSampler(threading.Thread):
+    """请求执行期间周期采样 tracemalloc 占用，在占用创新高时留存快照，近似峰值时刻的分配分布。"""
+
+    def __init__(self) -> None:
+        super().__init__(name="tracemalloc-sampler", daemon=True)
+        self._stop_event = threading.Event()
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_bytes = 0
+        self.snapshot_count = 0
+
+    def run(self) -> None:
+        while not self._stop_event.wait(_MEMORY_SAMPLE_SECONDS):
+            self.sample()
+
+    def sample(self) -> None:
+        if self.snapshot_count >= _MEMORY_SNAPSHOT_MAX_COUNT:
+            return
+        current, _ = tracemalloc.get_traced_memory()
+        threshold = max(
+            self.snapshot_bytes * _MEMORY_SNAPSHOT_GROWTH,
+            self.snapshot_bytes + _MEMORY_SNAPSHOT_MIN_STEP,
+        )
+        if current >= threshold:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_bytes = current
+            self.snapshot_count += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def profile_path(logs_dir: str, task_code: str, kind: str) -> str:
+    return os.path.join(logs_dir, f"{task_code}.{PROFILE_FILES[kind]}")
+
+
+@contextmanager
+def profile_task(logs_dir: str, task_code: str, enabled: bool) -> Iterator[Optional[Dict]]:
+    """对单个请求做剖析：cProfile（CPU）、torch profiler（算子级 trace）与 tracemalloc（内存峰值）。
+
+    - `enabled=False` 时不做任何事，产出 `None`；
+    - 否则产出一个摘要字典，退出时填充耗时、内存峰值与产物文件名，产物写入 `logs_dir`。
+    """
+    if not enabled:
+        yield None
+        return
+
+    summary: Dict = {}
+    with _PROFILE_LOCK:
+        logger.info("开始剖析，taskCode={}", task_code)
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            # 按代码行统计只需 1 层调用栈，更多层只会拖慢被剖析的请求
+            tracemalloc.start(1)
+        tracemalloc.reset_peak()
+        sampler = _PeakSnapshotSampler()
+        sampler.start()
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        torch_prof = torch.profiler.profile(activities=activities, record_shapes=True)
+        cpu_prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            with torch_prof:
+                cpu_prof.enable()
+                try:
+                    yield summary
+                finally:
+                    cpu_prof.disable()
+        finally:
+            wall = time.perf_counter() - t0
+            sampler.stop()
+            sampler.sample()
+            current, peak = tracemalloc.get_traced_memory()
+            end_snapshot = tracemalloc.take_snapshot()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            try:
+                _write_cpu_profile(cpu_prof, logs_dir, task_code)
+                torch_prof.export_chrome_trace(profile_path(logs_dir, task_code, "torch"))
+                _write_memory_summary(sampler, end_snapshot, current, peak, logs_dir, task_code)
+                summary.update({
+                    "wallSeconds": round(wall, 3),
+                    "peakTracedMB": round(peak / 1024 / 1024, 3),
+                    "scope": _PROFILE_SCOPE,
+                    "files": {k: os.path.basename(profile_path(logs_dir, task_code, k)) for k in PROFILE_FILES},
+                })
+                logger.info("剖析完成，taskCode={}，耗时={:.3f}s，内存峰值={:.1f}MB", task_code, wall, peak / 1024 / 1024)
+            except Exception as e:
+                logger.exception("剖析结果写入失败，taskCode={}：{}", task_code, e)
+
+
+def _write_cpu_profile(prof: cProfile.Profile, logs_dir: str, task_code: str) -> None:
+    prof.dump_stats(profile_path(logs_dir, task_code, "cpu-raw"))
+    buf = io.StringIO()
+    stats = pstats.Stats(prof, stream=buf)
+    buf.write("==== 按累计耗时排序（cumulative）====\n")
+    stats.sort_stats("cumulative").print_stats(60)
+    buf.write("\n==== 按自身耗时排序（tottime）====\n")
+    stats.sort_stats("tottime").print_stats(40)
+    with open(profile_path(logs_dir, task_code, "cpu"), "w", encoding="utf-8") as f:
+        f.write(buf.getvalue())
+
+
+def _write_memory_summary(
+    sampler: _PeakSnapshotSampler,
+    end_snapshot: tracemalloc.Snapshot,
+    current: int,
+    peak: int,
+    logs_dir: str,
+    task_code: str,
+) -> None:
+    lines = [
+        f"峰值内存（tracemalloc）：{peak / 1024 / 1024:.3f} MB",
+        f"结束时内存（tracemalloc）：{current / 1024 / 1024:.3f} MB",
+        "",
+        f"==== 采样到的最高占用时刻（{sampler.snapshot_bytes / 1024 / 1024:.3f} MB，"
+        f"每 {_MEMORY_SAMPLE_SECONDS}s 采样，增长不足 {_MEMORY_SNAPSHOT_MIN_STEP // 1024 // 1024} MB 时不重新快照，"
+        f"共 {sampler.snapshot_count}/{_MEMORY_SNAPSHOT_MAX_COUNT} 次，可能低于峰值）的分配（按代码行，前 30）====",
+    ]
+    if sampler.snapshot is not None:
+        lines.extend(str(stat) for stat in sampler.snapshot.statistics("lineno")[:30])
+    lines += ["", "==== 请求结束时仍占用的分配（按代码行，前 30）===="]
+    lines.extend(str(stat) for stat in end_snapshot.statistics("lineno")[:30])
+    with open(profile_path(logs_dir, task_code, "memory"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
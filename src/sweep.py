@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   sweep.py
+@Time    :   2025/11/20 10:02:31
+@Author  :   kaixinpangpangyu
+@Version :   1.0
+@Contact :   wangjinbo_0217@163.com
+@Motto   :   Innovate Today
+'''
+
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+from uni2ts.model.moirai2 import Moirai2Forecast
+
+from .utils import (
+    store_dir,
+    write_json_atomic,
+    load_moirai2_module,
+    load_csv_dataset,
+    compute_metadata,
+    clip_context_by_available_history,
+    enforce_moirai2_small_pred_len,
+    build_listdataset_from_starts,
+    extract_point_forecast,
+)
+
+
+_DEFAULTS_LOCK = threading.Lock()
+
+
+def _defaults_path() -> str:
+    return store_dir("sweep_defaults.json")
+
+
+def _defaults_key(
+    csv_path: str, target_column: str, feature: str, freq: str, aggregation: Optional[str]
+) -> str:
+    # 频率与聚合方式决定序列的时间粒度，推荐的长度不能跨粒度复用
+    return f"{os.path.abspath(csv_path)}::{target_column}::{feature}::{freq}::{aggregation or ''}"
+
+
+def _read_defaults() -> Dict:
+    path = _defaults_path()
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_sweep_default(
+    csv_path: str, target_column: str, feature: str, freq: str, aggregation: Optional[str] = None
+) -> Optional[Dict]:
+    """读取某数据集在给定频率/聚合方式下已保存的推荐配置；不存在时返回 `None`。"""
+    with _DEFAULTS_LOCK:
+        try:
+            return _read_defaults().get(_defaults_key(csv_path, target_column, feature, freq, aggregation))
+        except Exception as e:
+            logger.warning("读取超参推荐配置失败，忽略；原因：{}", e)
+            return None
+
+
+def save_sweep_default(
+    csv_path: str,
+    target_column: str,
+    feature: str,
+    freq: str,
+    aggregation: Optional[str],
+    config: Dict,
+) -> None:
+    """保存数据集的推荐配置（`contextLength`、`predictionLength`、`stride`）。"""
+    with _DEFAULTS_LOCK:
+        try:
+            data = _read_defaults()
+        except Exception as e:
+            logger.warning("超参推荐配置文件损坏，将重建；原因：{}", e)
+            data = {}
+        data[_defaults_key(csv_path, target_column, feature, freq, aggregation)] = config
+        write_json_atomic(_defaults_path(), data)
+    logger.info("已保存超参推荐配置：{}", config)
+
+
+def sweep_dataset_mse_mae(
+    csv_path: str,
+    target_column: str,
+    feature: str,
+    context_lengths: List[int],
+    prediction_lengths: List[int],
+    strides: Optional[List[int]],
+    batch_size: int,
+    freq: str,
+    train_ratio: float,
+    rank_by: str = "mse",
+    aggregation: Optional[str] = None,
+) -> Dict:
+    """在上下文长度 × 预测步数 × 步长的网格上评估 MSE/MAE，并给出推荐配置。
+
+    - CSV 只读取一次，模型权重常驻共享；
+    - 所有配置在同一评估区间上打分：标签起点从网格中最大的上下文长度开始，且保证最大预测步数的
+      标签完整；同一步长下各配置的标签起点完全相同，不同步长只是同一区间上的不同采样，排名才可比；
+    - 同一 (上下文长度, 预测步数) 下的多个步长共用窗口：对所有步长的标签起点取并集，
+      一次批量推理后再按步长分别汇总误差。
+    """
+    raw, covs, dates = load_csv_dataset(
+        csv_path, target_column, feature, "date", freq=freq, aggregation=aggregation
+    )
+    total_len = int(raw.shape[0])
+    past_covs = covs if covs.size > 0 else None
+
+    # 规整网格：裁剪后去重，避免同一配置重复推理
+    used_pls = sorted({enforce_moirai2_small_pred_len(int(pl)) for pl in prediction_lengths})
+    if used_pls[0] <= 0:
+        raise ValueError("predictionLength 必须为正数。")
+    if strides and any(int(s) <= 0 for s in strides):
+        raise ValueError("stride 必须为正数。")
+    max_pl = used_pls[-1]
+    # 上下文长度按最大预测步数裁剪，保证公共评估区间非空
+    used_ctxs = set()
+    for cl in context_lengths:
+        used_ctx = clip_context_by_available_history(total_len, max_pl, int(cl))
+        if used_ctx <= 0:
+            logger.warning("跳过无有效上下文的配置：上下文长度={}，预测步数上限={}", cl, max_pl)
+            continue
+        used_ctxs.add(used_ctx)
+    if not used_ctxs:
+        raise RuntimeError("网格中无有效配置；序列长度不足以评估。")
+
+    # 公共评估区间：标签起点取值于 [label_lo, label_hi]
+    label_lo = max(used_ctxs)
+    label_hi = total_len - max_pl
+    grid: Dict[tuple, set] = {
+        (used_ctx, used_pl): {int(s) for s in (strides or [used_pl])}
+        for used_ctx in used_ctxs
+        for used_pl in used_pls
+    }
+    logger.info(
+        "网格公共评估区间：标签起点 {}..{}，上下文长度={}，预测步数={}",
+        label_lo,
+        label_hi,
+        sorted(used_ctxs),
+        used_pls,
+    )
+
+    module = load_moirai2_module()
+    results = []
+    for (used_ctx, used_pl), stride_set in sorted(grid.items()):
+        metadata = compute_metadata(
+            raw,
+            train_ratio,
+            used_pl,
+            feature=feature,
+            past_feat_dim=covs.shape[0],
+            future_feat_dim=0,
+        )
+        labels_by_stride = {s: list(range(label_lo, label_hi + 1, s)) for s in sorted(stride_set)}
+        union_labels = sorted(set().union(*labels_by_stride.values()))
+        # 窗口起点 = 标签起点 - 上下文长度
+        union_starts = [lab - used_ctx for lab in union_labels]
+        logger.info(
+            "网格评估：上下文长度={}，预测步数={}，步长={}，共享窗口数={}",
+            used_ctx,
+            used_pl,
+            sorted(stride_set),
+            len(union_starts),
+        )
+
+        model = Moirai2Forecast(
+            module=module,
+            prediction_length=used_pl,
+            context_length=used_ctx,
+            target_dim=metadata["target_dim"],
+            feat_dynamic_real_dim=metadata["feat_dynamic_real_dim"],
+            past_feat_dynamic_real_dim=metadata["past_feat_dynamic_real_dim"],
+        )
+        predictor = model.create_predictor(batch_size=batch_size)
+        context_ds = build_listdataset_from_starts(
+            raw, union_starts, used_ctx, freq=freq, dates=dates, past_covs=past_covs
+        )
+        forecasts = list(predictor.predict(context_ds))
+        if len(forecasts) != len(union_starts):
+            raise RuntimeError(
+                f"预测结果数量不匹配：{len(forecasts)} 与窗口数 {len(union_starts)}。"
+            )
+
+        # 每个窗口（按标签起点索引）的误差平方和与绝对误差和，供各步长复用
+        sse: Dict[int, float] = {}
+        sae: Dict[int, float] = {}
+        for lab, fc in zip(union_labels, forecasts):
+            err = raw[lab : lab + used_pl] - extract_point_forecast(fc).reshape(-1)
+            sse[lab] = float(np.sum(err ** 2))
+            sae[lab] = float(np.sum(np.abs(err)))
+
+        for s, labels in labels_by_stride.items():
+            points = len(labels) * used_pl
+            results.append({
+                "contextLength": int(used_ctx),
+                "predictionLength": int(used_pl),
+                "stride": int(s),
+                "mse": sum(sse[i] for i in labels) / points,
+                "mae": sum(sae[i] for i in labels) / points,
+                "windows": len(labels),
+                "points": int(points),
+            })
+
+    if not results:
+        raise RuntimeError("无有效滑动窗口；序列长度不足以评估。")
+    secondary = "mae" if rank_by == "mse" else "mse"
+    results.sort(key=lambda r: (r[rank_by], r[secondary]))
+    for rank, r in enumerate(results, start=1):
+        r["rank"] = rank
+
+    return {
+        "results": results,
+        "recommended": results[0],
+        "meta": {
+            "total_length": total_len,
+            "rank_by": rank_by,
+            "configs": len(results),
+            # 公共评估区间内的标签起点范围（含两端）
+            "label_start": int(label_lo),
+            "label_last_start": int(label_hi),
+        },
+    }
@@ -11,21 +11,43 @@
 
 
 import os
-from typing import Dict, Tuple, List, Optional
+import json
+import threading
+from typing import Dict, Tuple, List, Optional, Sequence
 
 import numpy as np
 import pandas as pd
 from loguru import logger
 from gluonts.dataset.common import ListDataset
 from gluonts.dataset.split import split
+from uni2ts.model.moirai2 import Moirai2Module
 from settings.config import settings
 
 
+# 常驻模型缓存：按本地快照目录缓存 Moirai2Module，避免每次请求重复加载权重
+_MODULE_CACHE: Dict[str, Moirai2Module] = {}
+_MODULE_LOCK = threading.Lock()
+
+
 def project_root() -> str:
     # src/utils.py -> src -> 项目根目录
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
+def store_dir(*parts: str) -> str:
+    """本地存储目录（`settings.store_dirname`）下的路径。"""
+    return os.path.join(project_root(), settings.store_dirname, *parts)
+
+
+def write_json_atomic(path: str, data) -> None:
+    """先写临时文件再替换，避免并发读取到半写入的 JSON。"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
 def resolve_moirai2_local_path() -> str:
     root = project_root()
     local_dir = os.path.join(root, settings.models_dirname, settings.moirai2_local_dirname)
@@ -43,178 +65,362 @@ def resolve_moirai2_local_path() -> str:
     return local_dir
 
 
-def load_csv_target(csv_path: str, target_column: str) -> np.ndarray:
-    if not os.path.isfile(csv_path):
-        raise FileNotFoundError(f"未找到 CSV 文件：{csv_path}")
-    df = pd.read_csv(csv_path)
-    if target_column not in df.columns:
-        raise ValueError(f"目标列 '{target_column}' 不存在于 CSV。")
-    values = df[target_column].astype(float).to_numpy()
-    return values
+def load_moirai2_module() -> Moirai2Module:
+    """加载（或复用已常驻内存的）Moirai2 模块权重。
+
+    - 同一快照目录只加载一次，后续请求共享同一模块实例。
+    """
+    local_dir = resolve_moirai2_local_path()
+    with _MODULE_LOCK:
+        module = _MODULE_CACHE.get(local_dir)
+        if module is None:
+            logger.info("加载 Moirai2 模型权重：{}", local_dir)
+            module = Moirai2Module.from_pretrained(local_dir)
+            module.eval()
+            _MODULE_CACHE[local_dir] = module
+    return module
+
+
+AGGREGATIONS = ("mean", "sum", "last", "max")
 
 
-def load_csv_date_series(csv_path: str, date_column: str = "date") -> pd.Series:
-    """读取 CSV 的日期列为时间戳序列。
+def _aggregate(resampler, aggregation: str):
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"不支持的聚合方式 '{aggregation}'，可选：{', '.join(AGGREGATIONS)}。")
+    if aggregation == "sum":
+        # min_count=1：空桶先得到 NaN 以便统计缺口，随后再填 0
+        return resampler.sum(min_count=1)
+    return getattr(resampler, aggregation)()
 
-    - 期望格式：YYYY-MM-DD hh:mm:ss（可被 pandas 解析）
-    - 成功返回时间戳 `Series`；失败抛出异常，由调用方兜底。
+
+def _gap_fill_label(aggregation: str) -> str:
+    return "0" if aggregation == "sum" else "前值"
+
+
+def _incomplete_last_buckets(keys: pd.Series, ts: pd.Series, freq: str) -> pd.Index:
+    """返回末桶不完整的组键。
+
+    - 源数据采样间隔取组内相邻时间戳差值的中位数；将最后一个时间戳顺延一个间隔，若仍落在同一桶内，
+      说明源数据在该桶结束前就已截止（例如 1 分钟数据截止于 10:37 时按小时聚合的 10:00 桶）；
+    - 每组的首个时间戳一并参与分桶，使桶边界与实际重采样一致。
+    """
+    frame = pd.DataFrame({"key": keys.to_numpy(), "ts": ts.to_numpy()}).sort_values(["key", "ts"], kind="stable")
+    diffs = frame.groupby("key")["ts"].diff()
+    step = diffs.where(diffs > pd.Timedelta(0)).groupby(frame["key"]).median().dropna()
+    if step.empty:
+        return pd.Index([])
+    first = frame.groupby("key")["ts"].min().loc[step.index]
+    last = frame.groupby("key")["ts"].max().loc[step.index]
+    # 标记：首个时间戳 0、最后时间戳 1、顺延点 10；同一桶内标记和为 11 即末桶不完整
+    probe = pd.DataFrame({
+        "key": np.tile(step.index.to_numpy(), 3),
+        "ts": np.concatenate([first.to_numpy(), last.to_numpy(), (last + step).to_numpy()]),
+        "tag": np.repeat([0, 1, 10], len(step)),
+    })
+    tags = probe.groupby(["key", pd.Grouper(key="ts", freq=freq)])["tag"].sum()
+    return tags[tags == 11].index.get_level_values(0).unique()
+
+
+def resample_frame(df: pd.DataFrame, date_column: str, freq: str, aggregation: str) -> pd.DataFrame:
+    """按目标频率对数值列做向量化重采样聚合（mean / sum / last / max）。
+
+    - 依赖日期列，缺失或存在无法解析的值时抛出异常；
+    - 空桶（源数据缺口）保证送入模型的序列连续：`sum` 填 0（无数据即总量为 0），其余方式以前值填充；
+    - 源数据在末桶结束前截止时丢弃该不完整的末桶，避免把部分时段当作完整观测（对 `sum` 尤为明显）；
+    - 返回的 DataFrame 仍包含日期列（取值为各桶的起始时间）。
     """
-    if not os.path.isfile(csv_path):
-        raise FileNotFoundError(f"未找到 CSV 文件：{csv_path}")
-    df = pd.read_csv(csv_path)
     if date_column not in df.columns:
-        raise ValueError(f"日期列 '{date_column}' 不存在于 CSV。")
+        raise ValueError(f"重采样需要日期列 '{date_column}'，但其不存在于 CSV。")
     ts = pd.to_datetime(df[date_column], errors="coerce")
     if ts.isna().any():
-        raise ValueError("日期列存在无法解析的时间戳值。")
-    return ts
-
-
-def load_csv_target_and_covariates(csv_path: str, target_column: str, date_column: str = "date") -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        raise ValueError("日期列存在无法解析的时间戳值，无法重采样。")
+    num_df = df.drop(columns=[date_column]).select_dtypes(include=[np.number])
+    num_df.index = pd.DatetimeIndex(ts)
+    out = _aggregate(num_df.sort_index().resample(freq), aggregation)
+    if len(out) > 1 and len(_incomplete_last_buckets(pd.Series(0, index=ts.index), ts, freq)) > 0:
+        logger.warning("源数据截止于末桶 {} 结束之前；已丢弃该不完整的末桶。", out.index[-1])
+        out = out.iloc[:-1]
+    gaps = int(out.isna().all(axis=1).sum())
+    if gaps > 0:
+        logger.warning("重采样后存在 {} 个空桶（源数据缺口）；已使用{}填充。", gaps, _gap_fill_label(aggregation))
+    out = out.fillna(0) if aggregation == "sum" else out.ffill().bfill()
+    logger.info(
+        "已按 {} 重采样（聚合方式={}）：{} 行 -> {} 行",
+        freq,
+        aggregation,
+        len(df),
+        len(out),
+    )
+    out.index.name = date_column
+    return out.reset_index()
+
+
+def load_csv_frame(
+    csv_path: str,
+    date_column: str = "date",
+    freq: Optional[str] = None,
+    aggregation: Optional[str] = None,
+) -> pd.DataFrame:
+    """读取宽表 CSV；指定 `aggregation` 时按 `freq` 重采样聚合后返回。"""
     if not os.path.isfile(csv_path):
         raise FileNotFoundError(f"未找到 CSV 文件：{csv_path}")
     df = pd.read_csv(csv_path)
+    if aggregation is not None:
+        if not freq:
+            raise ValueError("重采样需要指定目标频率 freq。")
+        df = resample_frame(df, date_column, freq, aggregation)
+    return df
+
+
+def load_csv_dataset(
+    csv_path: str,
+    target_column: str,
+    feature: str = "S",
+    date_column: str = "date",
+    freq: Optional[str] = None,
+    aggregation: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray, Optional[pd.Series]]:
+    """一次读取 CSV，同时返回目标序列、协变量与日期列。
+
+    - 协变量仅在 `feature == "MS"` 时提取，形状为 `(dim, N)`；否则为 `(0, N)`。
+    - 指定 `aggregation` 时，先按 `freq` 对源数据重采样聚合，只有聚合后的序列进入后续流程。
+    - 日期列缺失或无法解析时返回 `None`，由调用方降级使用占位时间戳。
+    """
+    df = load_csv_frame(csv_path, date_column, freq=freq, aggregation=aggregation)
+    return split_frame(df, target_column, feature, date_column)
+
+
+def split_frame(
+    df: pd.DataFrame,
+    target_column: str,
+    feature: str = "S",
+    date_column: str = "date",
+) -> Tuple[np.ndarray, np.ndarray, Optional[pd.Series]]:
+    """将宽表 DataFrame 拆分为目标序列、协变量与日期列（语义同 `load_csv_dataset`）。"""
     if target_column not in df.columns:
-        raise ValueError(f"目标列 '{target_column}' 不存在于 CSV。")
+        raise ValueError(f"目标列 '{target_column}' 不存在于 CSV（或重采样时非数值列）。")
     target = df[target_column].astype(float).to_numpy()
-    cols = [c for c in df.columns if c not in {target_column, date_column}]
-    num_df = df[cols].select_dtypes(include=[np.number])
-    cov_cols = list(num_df.columns)
-    if len(cov_cols) == 0:
-        return target, np.zeros((0, len(target)), dtype=float), []
-    covs = num_df.astype(float).to_numpy().T
-    return target, covs, cov_cols
+    covs = np.zeros((0, len(target)), dtype=float)
+    if feature == "MS":
+        cols = [c for c in df.columns if c not in {target_column, date_column}]
+        num_df = df[cols].select_dtypes(include=[np.number])
+        if len(num_df.columns) > 0:
+            covs = num_df.astype(float).to_numpy().T
+    dates: Optional[pd.Series] = None
+    if date_column in df.columns:
+        ts = pd.to_datetime(df[date_column], errors="coerce")
+        if ts.isna().any():
+            logger.warning("日期列存在无法解析的时间戳值；使用占位时间戳。")
+        else:
+            dates = ts.reset_index(drop=True)
+    return target, covs, dates
+
+
+def load_long_csv_panel(
+    csv_path: str,
+    item_column: str,
+    target_column: str,
+    date_column: str = "date",
+    items: Optional[Sequence[str]] = None,
+    freq: Optional[str] = None,
+    aggregation: Optional[str] = None,
+) -> List[Tuple[str, np.ndarray, Optional[np.ndarray]]]:
+    """读取长表（`item_id, date, value`）CSV，并一次性拆分为各条目的序列。
+
+    - 只解析一次文件，经一次稳定排序后按条目边界切片（切片为视图，不复制），不逐条目过滤；
+    - `items` 指定时仅保留对应条目；
+    - 指定 `aggregation` 时按条目分组重采样到 `freq`，空桶在 `sum` 下填 0，其余方式以条目内前值填充；
+      条目的源数据在末桶结束前截止时丢弃该条目不完整的末桶；
+    - 返回 `[(item_id, target, dates)]`，`dates` 为 `datetime64` 数组，日期列缺失或无法解析时为 `None`。
+    """
+    if not os.path.isfile(csv_path):
+        raise FileNotFoundError(f"未找到 CSV 文件：{csv_path}")
+    wanted = {item_column, date_column, target_column}
+    df = pd.read_csv(csv_path, usecols=lambda c: c in wanted, dtype={item_column: str})
+    for col in (item_column, target_column):
+        if col not in df.columns:
+            raise ValueError(f"列 '{col}' 不存在于 CSV。")
+    if items:
+        # 过滤后复制一份，后续对日期列的赋值作用于独立的 DataFrame，而非原表切片
+        df = df[df[item_column].isin(set(items))].copy()
+        missing = set(items) - set(df[item_column].unique())
+        if missing:
+            logger.warning("以下条目不存在于 CSV，已忽略：{}", sorted(missing)[:20])
+
+    has_dates = False
+    if date_column in df.columns:
+        ts = pd.to_datetime(df[date_column], errors="coerce")
+        if ts.isna().any():
+            logger.warning("日期列存在无法解析的时间戳值；使用占位时间戳。")
+        else:
+            df[date_column] = ts
+            has_dates = True
+
+    if aggregation is not None:
+        if not freq:
+            raise ValueError("重采样需要指定目标频率 freq。")
+        if not has_dates:
+            raise ValueError(f"重采样需要可解析的日期列 '{date_column}'。")
+        grouped = df.set_index(date_column).groupby(item_column)[target_column]
+        out = _aggregate(grouped.resample(freq), aggregation)
+        incomplete = _incomplete_last_buckets(df[item_column], df[date_column], freq)
+        if len(incomplete) > 0:
+            by_item = out.groupby(level=0)
+            drop = (
+                (by_item.cumcount(ascending=False) == 0)
+                & (by_item.transform("size") > 1)
+                & out.index.get_level_values(0).isin(incomplete)
+            )
+            logger.warning("{} 个条目的源数据截止于末桶结束之前；已丢弃这些条目不完整的末桶。", int(drop.sum()))
+            out = out[~drop.to_numpy()]
+        gaps = int(out.isna().sum())
+        if gaps > 0:
+            logger.warning("重采样后存在 {} 个空桶（源数据缺口）；已按条目使用{}填充。", gaps, _gap_fill_label(aggregation))
+        if aggregation == "sum":
+            out = out.fillna(0)
+        else:
+            out = out.groupby(level=0).ffill().groupby(level=0).bfill()
+        df = out.reset_index()
+    else:
+        sort_cols = [item_column, date_column] if has_dates else [item_column]
+        df = df.sort_values(sort_cols, kind="stable")
+
+    keys = df[item_column].to_numpy()
+    values = df[target_column].astype(float).to_numpy()
+    dates = df[date_column].to_numpy() if has_dates else None
+    if len(keys) == 0:
+        return []
+    bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(keys)]))
+    logger.info("长表拆分完成：{} 行，{} 个条目", len(keys), len(starts))
+    return [
+        (str(keys[s]), values[s:e], dates[s:e] if dates is not None else None)
+        for s, e in zip(starts, ends)
+    ]
+
+
+def future_timestamps(dates, freq: str, prediction_length: int) -> Optional[List[str]]:
+    """根据最后一个历史时间戳与频率推算预测区间的时间戳；无日期列时返回 `None`。
+
+    - `dates` 可为 `pd.Series` 或 `datetime64` 数组。
+    """
+    if dates is None or len(dates) == 0:
+        return None
+    last = dates.iloc[-1] if isinstance(dates, pd.Series) else dates[-1]
+    idx = pd.date_range(start=pd.Timestamp(last), periods=prediction_length + 1, freq=freq)[1:]
+    return [t.isoformat() for t in idx]
 
 
-def build_context_only_listdataset(
+def make_context_only_entry(
     target: np.ndarray,
-    freq: str,
     used_ctx: int,
-    csv_path: Optional[str] = None,
-    date_column: str = "date",
+    dates: Optional[pd.Series] = None,
     past_covs: Optional[np.ndarray] = None,
-) -> ListDataset:
-    """仅基于序列最后 `used_ctx` 步构造数据集，用于纯外推预测。
+) -> Dict:
+    """构造纯外推预测的单个数据条目：`target` 取末尾 `used_ctx` 个点。
 
-    - `used_ctx`：实际使用的上下文长度（已按序列长度裁剪）。
-    - 返回包含一个条目的 `ListDataset`，其 `target` 为末尾 `used_ctx` 个点。
+    - `dates` 长度与 `target` 一致时使用真实起始时间戳，否则使用占位时间戳。
     """
-    if used_ctx <= 0:
-        raise ValueError("used_ctx 必须大于 0。")
-    # 优先尝试从 CSV 读取真实起始时间戳；失败则降级到占位时间戳
     start_ts = pd.Timestamp("2000-01-01 00:00:00")
-    if csv_path is not None:
-        try:
-            dates = load_csv_date_series(csv_path, date_column)
-            if len(dates) != int(target.shape[0]):
-                logger.warning(
-                    "读取日期列成功，但长度不匹配：date_len={}，target_len={}；使用占位时间戳。",
-                    len(dates),
-                    int(target.shape[0]),
-                )
-            else:
-                start_idx = int(target.shape[0]) - used_ctx
-                start_ts = pd.Timestamp(dates.iloc[start_idx])
-                logger.info("已使用 CSV 日期列作为起始时间戳：{}（索引={}）", start_ts, start_idx)
-        except Exception as e:
-            logger.warning("读取日期列失败，降级使用占位时间戳；原因：{}", e)
-    ctx = target[-used_ctx:]
-    entry = {"start": start_ts, "target": ctx}
+    if dates is not None:
+        if len(dates) != int(target.shape[0]):
+            logger.warning(
+                "读取日期列成功，但长度不匹配：date_len={}，target_len={}；使用占位时间戳。",
+                len(dates),
+                int(target.shape[0]),
+            )
+        else:
+            start_idx = int(target.shape[0]) - used_ctx
+            start_ts = pd.Timestamp(dates.iloc[start_idx])
+            logger.info("已使用 CSV 日期列作为起始时间戳：{}（索引={}）", start_ts, start_idx)
+    entry = {"start": start_ts, "target": target[-used_ctx:]}
     if past_covs is not None and past_covs.size > 0:
         entry["past_feat_dynamic_real"] = past_covs[:, -used_ctx:]
-    return ListDataset([entry], freq=freq)
+    return entry
 
 
-def make_sliding_context_and_labels(
-    target: np.ndarray,
-    context_length: int,
-    prediction_length: int,
-    step: int | None = None,
-) -> Tuple[List[np.ndarray], List[np.ndarray]]:
-    """基于整段序列生成滑动窗口的上下文与标签对。
+def make_window_starts(total_len: int, context_length: int, prediction_length: int, step: int) -> List[int]:
+    """返回滑动窗口的起始索引。
 
-    - 第一个窗口覆盖 `[0 : context_length + prediction_length)`；
-    - 后续窗口每次右移 `step`（默认与 `prediction_length` 一致）；
+    - 第一个窗口覆盖 `[0 : context_length + prediction_length)`，后续窗口每次右移 `step`；
     - 若最后一个窗口不足 `context_length + prediction_length`，则舍弃。
-
-    返回：两个列表，`contexts` 与 `labels`，长度一致。
     """
-    n = int(target.shape[0])
-    if step is None:
-        step = prediction_length
-    if context_length <= 0 or prediction_length <= 0:
-        raise ValueError("context_length 与 prediction_length 必须为正数。")
-    contexts: List[np.ndarray] = []
-    labels: List[np.ndarray] = []
-    window = context_length + prediction_length
-    if n < window:
-        return contexts, labels
-    start = 0
-    while start + window <= n:
-        ctx = target[start : start + context_length]
-        lab = target[start + context_length : start + window]
-        contexts.append(ctx.astype(float))
-        labels.append(lab.astype(float))
-        start += step
-    return contexts, labels
-
-
-def build_listdataset_from_contexts(
-    contexts: List[np.ndarray],
+    if context_length <= 0 or prediction_length <= 0 or step <= 0:
+        raise ValueError("context_length、prediction_length 与 step 必须为正数。")
+    last = int(total_len) - (context_length + prediction_length)
+    if last < 0:
+        return []
+    return list(range(0, last + 1, int(step)))
+
+
+def build_listdataset_from_starts(
+    target: np.ndarray,
+    starts: Sequence[int],
+    context_length: int,
     freq: str,
-    csv_path: Optional[str] = None,
-    date_column: str = "date",
-    step: Optional[int] = None,
+    dates: Optional[pd.Series] = None,
     past_covs: Optional[np.ndarray] = None,
-    context_length: Optional[int] = None,
 ) -> ListDataset:
-    """将多个上下文片段封装为 GluonTS 的 `ListDataset`。
+    """按给定的窗口起始索引切片上下文并封装为 `ListDataset`。
 
-    - 每个条目的 `target` 为一个上下文序列。
-    - 默认使用固定的起始时间戳占位；若提供 `csv_path` 且能读取日期列，则每个窗口使用其真实起始时间戳。
+    - 窗口起点可任意给定（例如多个步长的并集），上下文按需切片，不预先复制；
+    - 日期列由调用方预先读取并传入，避免重复读取 CSV。
     """
-    # 默认占位时间戳
     default_ts = pd.Timestamp("2000-01-01 00:00:00")
-
-    # 若提供 csv_path 并且 step 有值，则尝试读取真实起始时间戳
-    if csv_path is not None and step is not None:
-        try:
-            dates = load_csv_date_series(csv_path, date_column)
-            entries = []
-            for i, c in enumerate(contexts):
-                start_idx = i * int(step)
-                if start_idx >= len(dates):
-                    logger.warning(
-                        "窗口起始索引超出日期序列范围：start_idx={}，date_len={}；使用占位时间戳。",
-                        start_idx,
-                        len(dates),
-                    )
-                    e = {"start": default_ts, "target": c}
-                    if past_covs is not None and past_covs.size > 0 and context_length is not None:
-                        e["past_feat_dynamic_real"] = past_covs[:, start_idx : start_idx + int(context_length)]
-                    entries.append(e)
-                else:
-                    st = pd.Timestamp(dates.iloc[start_idx])
-                    e = {"start": st, "target": c}
-                    if past_covs is not None and past_covs.size > 0 and context_length is not None:
-                        e["past_feat_dynamic_real"] = past_covs[:, start_idx : start_idx + int(context_length)]
-                    entries.append(e)
-            logger.info("滑动窗口已使用 CSV 日期列作为起始时间戳，共 {} 个窗口。", len(entries))
-            return ListDataset(entries, freq=freq)
-        except Exception as e:
-            logger.warning("读取日期列失败，滑动窗口降级使用占位时间戳；原因：{}", e)
-
-    # 兜底：全部使用占位时间戳
+    use_dates = dates is not None and len(dates) == int(target.shape[0])
+    if dates is not None and not use_dates:
+        logger.warning(
+            "日期列长度不匹配：date_len={}，target_len={}；使用占位时间戳。",
+            len(dates),
+            int(target.shape[0]),
+        )
     entries = []
-    for i, c in enumerate(contexts):
-        e = {"start": default_ts, "target": c}
-        if past_covs is not None and past_covs.size > 0 and context_length is not None and step is not None:
-            start_idx = i * int(step)
-            e["past_feat_dynamic_real"] = past_covs[:, start_idx : start_idx + int(context_length)]
+    for start_idx in starts:
+        st = pd.Timestamp(dates.iloc[start_idx]) if use_dates else default_ts
+        e = {"start": st, "target": target[start_idx : start_idx + context_length]}
+        if past_covs is not None and past_covs.size > 0:
+            e["past_feat_dynamic_real"] = past_covs[:, start_idx : start_idx + context_length]
         entries.append(e)
     return ListDataset(entries, freq=freq)
 
 
+def extract_point_forecast(fc) -> np.ndarray:
+    """提取单个预测对象的点预测（优先中位数，其次均值或样本均值）。"""
+    if hasattr(fc, "quantile"):
+        p = np.array(fc.quantile(0.5))
+    elif hasattr(fc, "mean") and fc.mean is not None:
+        p = np.array(fc.mean)
+    elif hasattr(fc, "samples") and fc.samples is not None:
+        p = np.array(fc.samples).mean(axis=0)
+    else:
+        raise RuntimeError("不支持的预测对象格式。")
+    return p.squeeze()
+
+
+def extract_quantile_forecast(fc, lower_q: float, upper_q: float) -> Tuple[List[float], List[float], List[float]]:
+    """提取单个预测对象的中位数与上下分位数。
+
+    - 无分位数接口时以均值作为中位数；若存在样本，则用 ±1 标准差作为上下界。
+    """
+    if hasattr(fc, "quantile"):
+        median = np.array(fc.quantile(0.5)).tolist()
+        lower = np.array(fc.quantile(lower_q)).tolist()
+        upper = np.array(fc.quantile(upper_q)).tolist()
+        return median, lower, upper
+    if hasattr(fc, "mean") and fc.mean is not None:
+        m = np.array(fc.mean)
+    elif hasattr(fc, "samples") and fc.samples is not None:
+        m = np.array(fc.samples).mean(axis=0)
+    else:
+        raise RuntimeError("不支持的预测对象：不存在分位数、均值或样本。")
+    median = m.squeeze().tolist()
+    if hasattr(fc, "samples") and fc.samples is not None:
+        std = np.array(fc.samples).std(axis=0)
+        return median, (m - std).squeeze().tolist(), (m + std).squeeze().tolist()
+    return median, median, median
+
+
 def create_tail_test_instances(full_ds: ListDataset, prediction_length: int):
     # 在序列尾部偏移处切分以生成单次预测窗口
     test_input, test_template = split(full_ds, offset=-prediction_length)  # N - prediction_length, prediction_length 